@@ -0,0 +1,37 @@
+"""
+Fills the ``conversations`` table behind the message inbox from existing
+message history.
+
+Run it once after deploying the conversation index. Conversations already
+in the table are left as they are, so it is safe to run while the app is
+serving and to run again.
+
+    python backfill_conversations.py
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from supabase import create_async_client
+
+from src.utils import UserHandler
+
+load_dotenv()
+
+
+async def main():
+    user_handler = UserHandler()
+    user_handler.supabase = await create_async_client(
+        os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"]
+    )
+    try:
+        found = await user_handler.backfill_conversations()
+    finally:
+        await user_handler.supabase.postgrest.aclose()
+    print(f"backfilled {found} conversations")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+Measures EmailQueue delivery throughput against the local SMTP sink.
+
+    python -m benchmarks.email_throughput --messages 500 --workers 1 2 4 --latency 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.smtp_sink import SMTPSink
+from src.utils.email_handler import EmailQueue, render_otp_mail
+
+
+async def run(messages: int, workers: int, latency: float) -> float:
+    sink = SMTPSink(port=0, latency=latency)
+    await sink.start()
+
+    queue = EmailQueue(
+        hostname=sink.host,
+        port=sink.port,
+        username=None,
+        start_tls=False,
+        workers=workers,
+        maxsize=messages,
+    )
+    ini = time.perf_counter()
+    for i in range(messages):
+        queue.enqueue(render_otp_mail(f"user{i}@example.com", "123456"))
+    await queue.close(timeout=600)
+    elapsed = time.perf_counter() - ini
+
+    await sink.close()
+    assert sink.messages == messages, (sink.messages, messages)
+    print(
+        f"workers={workers:<3} sent={queue.sent:<6} connections={sink.connections:<3} "
+        f"{messages / elapsed:10.1f} msg/s"
+    )
+    return messages / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        await run(args.messages, workers, args.latency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,466 @@
+"""
+An in-memory stand-in for Supabase's PostgREST API, seeded with fake data.
+
+It understands the subset of PostgREST the app uses: ``select``, the
+``eq/neq/lt/lte/gt/gte/in/is`` operators and ``not.``, nested ``or``/``and``,
+``order``, ``limit``/``offset``, ``Prefer: count=exact``, embedded
+resources such as ``select=*,liked:ShowCaseLikeModel(user_id)`` filtered by
+``liked.user_id=eq.<id>``, inserts with ``on_conflict`` (merged under
+``resolution=merge-duplicates``), updates and deletes. The counter columns
+the database keeps by trigger and the functions called through ``rpc/``, see
+``migrations/``, are emulated too.
+Every request is delayed by
+``--latency`` seconds to mimic the network hop to the database.
+
+    python -m benchmarks.fake_postgrest --port 54321 --latency 0.005 --users 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from fastapi import FastAPI, Request, Response
+
+GENRES = [
+    "videographer", "photographer", "vocalist", "dancer", "drummer", "editor",
+    "actor", "composer", "director", "writer", "graphicDesigner", "singer",
+    "guitarist", "sitarist", "pianist", "violinist", "flutist", "percussionist",
+]
+WORK_MODES = ["Online", "Onsite", "OnsiteOnline"]
+PAYMENT_MODES = ["free", "paid"]
+PASSWORD = "password"
+
+# parameters that shape the response rather than filter rows
+RESERVED = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+app = FastAPI()
+TABLES: Dict[str, List[dict]] = {}
+LATENCY = 0.0
+
+# child table -> (parent table, foreign key, parent counter column), the
+# counters maintained by triggers in migrations/showcase_counters.sql
+COUNTERS = {
+    "ShowCaseLikeModel": ("showcases", "showcase_id", "like_count"),
+    "ShowCaseBookmarkModel": ("showcases", "showcase_id", "bookmark_count"),
+    "comments": ("showcases", "showcase_id", "comment_count"),
+}
+
+# table -> column -> value -> rows, built on first use and kept up to date
+_indexes: Dict[str, Dict[str, Dict[str, List[dict]]]] = defaultdict(dict)
+
+
+def seed(
+    users: int = 1000,
+    follows: int = 20,
+    showcases: int = 5,
+    messages: int = 10,
+    *,
+    rng_seed: int = 0,
+) -> Dict[str, List[dict]]:
+    """
+    Builds a deterministic data set: calling it twice with the same arguments
+    yields the same ids, so a load driver can address seeded rows.
+    """
+    rng = random.Random(rng_seed)
+    epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def timestamp() -> str:
+        return (epoch + timedelta(seconds=rng.randrange(180 * 86400))).isoformat()
+
+    tables: Dict[str, List[dict]] = defaultdict(list)
+    user_ids = [new_id() for _ in range(users)]
+    for i, user_id in enumerate(user_ids):
+        tables["users"].append({
+            "id": user_id,
+            "name": f"User {i}",
+            "email": f"user{i}@example.com",
+            # stored in the clear; the app re-hashes it on first sign in
+            "password": PASSWORD,
+            "profile_image_url": None,
+            "age": rng.randrange(18, 60),
+            "genres": rng.choice(GENRES),
+            "payment_mode": rng.choice(PAYMENT_MODES),
+            "work_mode": rng.choice(WORK_MODES),
+            "rating": round(rng.uniform(1, 5), 2),
+            "latitude": round(rng.uniform(8, 32), 5),
+            "longitude": round(rng.uniform(70, 88), 5),
+            "created_at": timestamp(),
+        })
+
+    for user_id in user_ids:
+        for following_id in rng.sample(user_ids, min(follows, users - 1)):
+            if following_id != user_id:
+                tables["FollowerModel"].append(
+                    {"user_id": user_id, "following_id": following_id, "created_at": timestamp()}
+                )
+
+        for _ in range(showcases):
+            showcase_id = new_id()
+            tables["showcases"].append({
+                "id": showcase_id,
+                "owner_id": user_id,
+                "visionboard": None,
+                "description": "A showcase " * 8,
+                "media_link": f"https://cdn.example.com/{showcase_id}.jpg",
+                "media_type": "image",
+                "like_count": min(3, users),
+                "bookmark_count": 0,
+                "comment_count": 1,
+                "created_at": timestamp(),
+            })
+            for liker in rng.sample(user_ids, min(3, users)):
+                tables["ShowCaseLikeModel"].append(
+                    {"user_id": liker, "showcase_id": showcase_id, "created_at": timestamp()}
+                )
+            tables["comments"].append({
+                "id": new_id(),
+                "showcase_id": showcase_id,
+                "author_id": rng.choice(user_ids),
+                "text": "Nice work",
+                "timestamp": timestamp(),
+            })
+
+        for _ in range(messages):
+            tables["messages"].append({
+                "id": new_id(),
+                "sender_id": user_id,
+                "receiver_id": rng.choice(user_ids),
+                "message": "Hey, are you free next week?",
+                "created_at": timestamp(),
+            })
+
+    return dict(tables)
+
+
+def load(tables: Dict[str, List[dict]]) -> None:
+    TABLES.clear()
+    TABLES.update(tables)
+    _indexes.clear()
+
+
+def _split(expr: str) -> List[str]:
+    parts, depth, current = [], 0, ""
+    for char in expr:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _comparable(a, b):
+    try:
+        return float(a), float(b)
+    except (TypeError, ValueError):
+        return str(a), str(b)
+
+
+def _predicate(column: str, expr: str) -> Callable[[dict], bool]:
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, value = expr.partition(".")
+
+    if op == "in":
+        values = {v.strip('"') for v in _split(value[1:-1])}
+        test = lambda cell: str(cell) in values
+    elif op == "is":
+        value = value.strip('"')
+        test = (lambda cell: cell is None) if value == "null" else (
+            lambda cell: str(cell).lower() == value
+        )
+    else:
+        value = value.strip('"')
+        compare = {
+            "eq": lambda a, b: a == b, "neq": lambda a, b: a != b,
+            "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+            "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+        }[op]
+
+        def test(cell):
+            if cell is None:
+                return False
+            if op == "eq" and str(cell) == value:
+                return True
+            return compare(*_comparable(cell, value))
+
+    if negate:
+        return lambda row: not test(row.get(column))
+    return lambda row: test(row.get(column))
+
+
+def _logic(kind: str, body: str) -> Callable[[dict], bool]:
+    terms = []
+    for term in _split(body):
+        nested = re.match(r"^(and|or)\((.*)\)$", term)
+        if nested:
+            terms.append(_logic(nested.group(1), nested.group(2)))
+        else:
+            column, _, expr = term.partition(".")
+            terms.append(_predicate(column, expr))
+    combine = all if kind == "and" else any
+    return lambda row: combine(term(row) for term in terms)
+
+
+def _compile(params) -> List[Callable[[dict], bool]]:
+    # parse the filters once per request rather than once per row; dotted
+    # keys filter an embedded resource instead, see _project
+    return [
+        _logic(key, value[1:-1]) if key in ("or", "and") else _predicate(key, value)
+        for key, value in params
+        if key not in RESERVED and "." not in key
+    ]
+
+
+def _index(table: str, column: str) -> Dict[str, List[dict]]:
+    index = _indexes[table].get(column)
+    if index is None:
+        index = _indexes[table][column] = defaultdict(list)
+        for row in TABLES.get(table, []):
+            index[str(row.get(column))].append(row)
+    return index
+
+
+def _candidates(table: str, params) -> Iterable[dict]:
+    # narrow the scan with the first plain eq/in filter, like a btree would
+    for key, value in params:
+        if key in RESERVED or key in ("or", "and") or "." in key:
+            continue
+        if value.startswith("eq."):
+            return list(_index(table, key).get(value[3:].strip('"'), []))
+        if value.startswith("in.("):
+            index = _index(table, key)
+            seen = {v.strip('"') for v in _split(value[4:-1])}
+            return [row for v in seen for row in index.get(v, [])]
+    return TABLES.get(table, [])
+
+
+def _filter(table: str, params) -> List[dict]:
+    predicates = _compile(params)
+    return [
+        row for row in _candidates(table, params)
+        if all(predicate(row) for predicate in predicates)
+    ]
+
+
+def _order(rows: List[dict], order: str) -> None:
+    for part in reversed(order.split(",")):
+        column, *modifiers = part.split(".")
+        rows.sort(
+            key=lambda row: (
+                row.get(column) is None,
+                _comparable(row.get(column), 0)[0] if row.get(column) is not None else 0,
+            ),
+            reverse="desc" in modifiers,
+        )
+
+
+def _project(table: str, rows: List[dict], select: str, params) -> List[dict]:
+    if not select or select == "*":
+        return rows
+    columns, embeds = [], []
+    for column in _split(select):
+        column = column.strip()
+        embedded = re.match(r"^(?:(\w+):)?(\w+)\((.*)\)$", column)
+        if embedded:
+            embeds.append(embedded.groups())
+        else:
+            columns.append(column)
+
+    projected = []
+    for row in rows:
+        item = dict(row) if "*" in columns else {column: row.get(column) for column in columns}
+        for alias, child, child_select in embeds:
+            # joined on the child's <parent>_id column, which stands in for
+            # the foreign key PostgREST would follow
+            alias = alias or child
+            filters = [
+                (key[len(alias) + 1:], value) for key, value in params
+                if key.startswith(alias + ".")
+            ]
+            matched = _filter(child, [(f"{table.rstrip('s')}_id", f"eq.{row.get('id')}"), *filters])
+            item[alias] = _project(child, matched, child_select, [])
+        projected.append(item)
+    return projected
+
+
+def _count(table: str, row: dict, step: int) -> None:
+    counter = COUNTERS.get(table)
+    if counter is None:
+        return
+    parent, key, column = counter
+    for target in _index(parent, "id").get(str(row.get(key)), []):
+        target[column] = max((target.get(column) or 0) + step, 0)
+
+
+def _insert(
+    table: str, rows: List[dict], payload: List[dict], on_conflict: Optional[str], merge: bool
+):
+    conflict = [column for column in (on_conflict or "").split(",") if column]
+    created = []
+    for item in payload:
+        item = dict(item)
+        existing = conflict and next(
+            (
+                row for row in _candidates(table, [(conflict[0], f"eq.{item.get(conflict[0])}")])
+                if all(str(row.get(c)) == str(item.get(c)) for c in conflict)
+            ),
+            None,
+        )
+        if existing:
+            if merge:
+                existing.update(item)
+                _indexes.pop(table, None)
+                created.append(existing)
+            continue
+        item.setdefault("id", str(uuid.uuid4()))
+        item.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        rows.append(item)
+        for column, index in _indexes[table].items():
+            index[str(item.get(column))].append(item)
+        _count(table, item, 1)
+        created.append(item)
+    return created
+
+
+def _record_message(sender: str, receiver: str, preview: str, sent_at: str) -> None:
+    rows = TABLES.setdefault("conversations", [])
+    for user_id, counterpart_id, unread in ((sender, receiver, 0), (receiver, sender, 1)):
+        if unread and sender == receiver:
+            continue
+        existing = next(
+            (row for row in _candidates("conversations", [("user_id", f"eq.{user_id}")])
+             if row["counterpart_id"] == counterpart_id),
+            None,
+        )
+        if existing is None:
+            existing = {"user_id": user_id, "counterpart_id": counterpart_id, "unread_count": 0}
+            _insert("conversations", rows, [existing], None, False)
+            existing = rows[-1]
+        existing["unread_count"] = existing.get("unread_count", 0) + unread
+        if not existing.get("last_message_at") or sent_at >= existing["last_message_at"]:
+            existing.update(last_message=preview, last_sender_id=sender, last_message_at=sent_at)
+
+
+# migrations/*.sql functions, by name
+FUNCTIONS = {"record_message": _record_message}
+
+
+@app.post("/rest/v1/rpc/{name}")
+async def rpc(name: str, request: Request) -> Response:
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    result = FUNCTIONS[name](**json.loads(await request.body()))
+    return Response(json.dumps(result), media_type="application/json")
+
+
+@app.api_route("/rest/v1/", methods=["GET", "HEAD"])
+async def root() -> Response:
+    return Response(b"{}", media_type="application/json")
+
+
+@app.api_route("/rest/v1/{table}", methods=["GET", "HEAD", "POST", "PATCH", "DELETE"])
+async def handle(table: str, request: Request) -> Response:
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+
+    rows = TABLES.setdefault(table, [])
+    params = list(request.query_params.multi_items())
+    query = dict(params)
+    prefer = request.headers.get("prefer", "")
+
+    if request.method in ("GET", "HEAD"):
+        result = _filter(table, params)
+        if query.get("order"):
+            _order(result, query["order"])
+        total = len(result)
+        offset = int(query.get("offset", 0))
+        end = offset + int(query["limit"]) if "limit" in query else None
+        result = result[offset:end]
+
+        headers = {
+            "content-range": "%d-%d/%s" % (
+                offset, offset + max(len(result) - 1, 0),
+                total if "count=" in prefer else "*",
+            )
+        }
+        body = b"" if request.method == "HEAD" else json.dumps(
+            _project(table, result, query.get("select", "*"), params)
+        ).encode()
+        return Response(body, media_type="application/json", headers=headers)
+
+    if request.method == "POST":
+        payload = json.loads(await request.body())
+        payload = payload if isinstance(payload, list) else [payload]
+        created = _insert(
+            table, rows, payload, query.get("on_conflict"), "merge-duplicates" in prefer
+        )
+        return Response(json.dumps(created), status_code=201, media_type="application/json")
+
+    matched = _filter(table, params)
+    if request.method == "PATCH":
+        payload = json.loads(await request.body())
+        for row in matched:
+            row.update(payload)
+        _indexes.pop(table, None)
+        return Response(json.dumps(matched), media_type="application/json")
+
+    doomed = {id(row) for row in matched}
+    rows[:] = [row for row in rows if id(row) not in doomed]
+    for row in matched:
+        _count(table, row, -1)
+    _indexes.pop(table, None)
+    return Response(json.dumps(matched), media_type="application/json")
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--follows", type=int, default=20, help="follows per user")
+    parser.add_argument("--showcases", type=int, default=5, help="showcases per user")
+    parser.add_argument("--messages", type=int, default=10, help="messages sent per user")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def seed_from_args(args: argparse.Namespace) -> Dict[str, List[dict]]:
+    return seed(
+        args.users, args.follows, args.showcases, args.messages, rng_seed=args.seed
+    )
+
+
+def main():
+    global LATENCY
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.0)
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    load(seed_from_args(args))
+    print(
+        "Fake PostgREST on %s:%d with %s"
+        % (args.host, args.port, ", ".join(f"{len(v)} {k}" for k, v in TABLES.items()))
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Drives a weighted mix of API requests against the app backed by the fake
+PostgREST server and reports throughput and p50/p95/p99 latency per route.
+
+The fake database and the app (through ``serve.py``) are started as
+subprocesses unless ``--target`` points at an app that is already running
+against a fake seeded with the same arguments. Results can be saved as a
+baseline and later runs compared against it; a route whose p95 grows, or
+whose throughput drops, by more than ``--tolerance`` is reported as a
+regression and the run exits non-zero. Baselines are only comparable on the
+same machine and configuration, so ``baseline.json`` is not committed: save
+one locally before a change, then compare after it. A run with errors is
+not saved as a baseline.
+
+    python -m benchmarks.load_test --duration 20 --concurrency 32 --latency 0.005
+    python -m benchmarks.load_test --save-baseline
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+import httpx
+import jwt
+
+from benchmarks import fake_postgrest
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+
+class Route(NamedTuple):
+    name: str
+    method: str
+    weight: int
+    # (user, rng, data) -> (path, params, json body)
+    build: Callable
+
+
+def _user(data, rng):
+    return rng.choice(data["users"])
+
+
+def _showcase(data, rng):
+    return rng.choice(data["showcases"])
+
+
+ROUTES: List[Route] = [
+    Route("GET /v1/showcases", "GET", 8,
+          lambda user, rng, data: ("/v1/showcases", {}, None)),
+    Route("GET /v1/browse/artist/{id}/showcase", "GET", 12,
+          lambda user, rng, data: (f"/v1/browse/artist/{_user(data, rng)['id']}/showcase", {}, None)),
+    Route("GET /v1/showcase/{id}", "GET", 5,
+          lambda user, rng, data: (f"/v1/showcase/{_showcase(data, rng)['id']}", {}, None)),
+    Route("GET /v1/showcase/{id}/detail", "GET", 12,
+          lambda user, rng, data: (f"/v1/showcase/{_showcase(data, rng)['id']}/detail", {}, None)),
+    Route("PUT /v1/showcase/{id}/like", "PUT", 6,
+          lambda user, rng, data: (f"/v1/showcase/{_showcase(data, rng)['id']}/like", {}, None)),
+    Route("PUT /v1/showcase/{id}/unlike", "PUT", 3,
+          lambda user, rng, data: (f"/v1/showcase/{_showcase(data, rng)['id']}/unlike", {}, None)),
+    Route("GET /v1/followers", "GET", 6,
+          lambda user, rng, data: ("/v1/followers", {}, None)),
+    Route("GET /v1/following", "GET", 6,
+          lambda user, rng, data: ("/v1/following", {}, None)),
+    Route("GET /v1/user/{id}/follow-stats", "GET", 5,
+          lambda user, rng, data: (f"/v1/user/{_user(data, rng)['id']}/follow-stats", {}, None)),
+    Route("GET /v1/mutuals", "GET", 3,
+          lambda user, rng, data: ("/v1/mutuals", {}, None)),
+    Route("GET /v1/browse/top-rated", "GET", 8,
+          lambda user, rng, data: ("/v1/browse/top-rated", {}, None)),
+    Route("GET /v1/browse/near-by-artist", "GET", 8,
+          lambda user, rng, data: ("/v1/browse/near-by-artist", {}, None)),
+    Route("GET /v1/message/users", "GET", 2,
+          lambda user, rng, data: ("/v1/message/users", {}, None)),
+    Route("GET /v1/message/{id}/{limit}", "GET", 5,
+          lambda user, rng, data: (f"/v1/message/{_user(data, rng)['id']}/20", {}, None)),
+    Route("POST /v1/message/{id}/create", "POST", 3,
+          lambda user, rng, data: (f"/v1/message/{_user(data, rng)['id']}/create",
+                                   {"message": "load test"}, None)),
+    Route("GET /auth/fetch", "GET", 5,
+          lambda user, rng, data: ("/auth/fetch", {}, None)),
+    Route("POST /auth/signin", "POST", 1,
+          lambda user, rng, data: ("/auth/signin", {},
+                                   {"email": user["email"], "password": fake_postgrest.PASSWORD})),
+]
+
+
+def mint_token(user: dict, secret: str, ttl: int = 3600) -> str:
+    now = int(time.time())
+    payload = {
+        "sub": user["id"], "email": user["email"], "name": user["name"],
+        "iat": now, "exp": now + ttl,
+    }
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def _row(values: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2),
+        **{f"p{p}": round(percentile(values, p) * 1000, 3) for p in (50, 95, 99)},
+    }
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    routes = {
+        name: _row(samples.get(name, []), errors.get(name, 0), elapsed)
+        for name in sorted(set(samples) | set(errors))
+    }
+    everything = [value for values in samples.values() for value in values]
+    return {"routes": routes, "total": _row(everything, sum(errors.values()), elapsed)}
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{'route':<40} {'count':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, row in [*result["routes"].items(), ("TOTAL", result["total"])]:
+        print(
+            f"{name:<40} {row['count']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+            f"{row['p50']:>8.2f} {row['p95']:>8.2f} {row['p99']:>8.2f}"
+        )
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_samples: int = 30) -> List[str]:
+    """
+    Prints the change against ``baseline`` and returns the regressed routes.
+    Routes with fewer than ``min_samples`` requests in either run are shown
+    but not judged; their percentiles are mostly noise.
+    """
+    regressions = []
+    for key in ("machine", "config"):
+        if baseline.get(key) != result.get(key):
+            print(f"warning: baseline {key} {baseline.get(key)} differs from {result.get(key)}")
+    print(f"\n{'route':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9}")
+    current = {**result["routes"], "TOTAL": result["total"]}
+    previous = {**baseline["routes"], "TOTAL": baseline["total"]}
+    for name in current:
+        if name not in previous:
+            continue
+        now, before = current[name], previous[name]
+
+        def delta(key):
+            return (now[key] - before[key]) / before[key] if before[key] else 0.0
+
+        changes = {key: delta(key) for key in ("p50", "p95", "p99", "rps")}
+        judged = min(now["count"], before["count"]) >= min_samples
+        regressed = judged and (changes["p95"] > tolerance or changes["rps"] < -tolerance)
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<40} "
+            + " ".join(f"{changes[key]:>+8.1%}" for key in ("p50", "p95", "p99", "rps"))
+            + ("  REGRESSION" if regressed else "")
+        )
+    return regressions
+
+
+async def drive(
+    target: str,
+    data: dict,
+    secret: str,
+    *,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    rng_seed: int,
+) -> dict:
+    routes = [route for route in ROUTES if route.weight]
+    weights = [route.weight for route in routes]
+    tokens = {user["id"]: mint_token(user, secret) for user in data["users"]}
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def virtual_user(index: int, client: httpx.AsyncClient):
+        rng = random.Random(rng_seed * 1000 + index)
+        while True:
+            ini = time.perf_counter()
+            if ini >= stop_at:
+                return
+            user = rng.choice(data["users"])
+            route = rng.choices(routes, weights)[0]
+            path, params, body = route.build(user, rng, data)
+            ok = False
+            # the server closes the connection after a 500, so a reused
+            # connection may already be dead; retry once on a fresh one
+            for _ in range(2):
+                try:
+                    response = await client.request(
+                        route.method, path, params=params, json=body,
+                        headers={"Authorization": f"Bearer {tokens[user['id']]}"},
+                    )
+                    ok = response.status_code < 400
+                    break
+                except httpx.TransportError:
+                    continue
+                except httpx.HTTPError:
+                    break
+            fin = time.perf_counter()
+            if ini < measure_from:
+                continue
+            if ok:
+                samples[route.name].append(fin - ini)
+            else:
+                errors[route.name] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=30) as client:
+        await asyncio.gather(*(virtual_user(i, client) for i in range(concurrency)))
+
+    return summarize(samples, errors, duration)
+
+
+async def wait_until_up(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+def spawn(args: argparse.Namespace, secret: str) -> List[subprocess.Popen]:
+    root = Path(__file__).resolve().parent.parent
+    seed_args = [
+        "--users", str(args.users), "--follows", str(args.follows),
+        "--showcases", str(args.showcases), "--messages", str(args.messages),
+        "--seed", str(args.seed),
+    ]
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_postgrest",
+         "--port", str(args.fake_port), "--latency", str(args.latency), *seed_args],
+        cwd=root,
+    )
+    env = {
+        **os.environ,
+        "HOST": "127.0.0.1",
+        "PORT": str(args.port),
+        "WORKERS": str(args.workers),
+        "SUPABASE_URL": f"http://127.0.0.1:{args.fake_port}",
+        "SUPABASE_KEY": os.getenv("SUPABASE_KEY", "benchmark"),
+        "JWT_SECRET": secret,
+    }
+    app = subprocess.Popen([sys.executable, "serve.py"], cwd=root, env=env)
+    return [fake, app]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", help="URL of an already running app")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=54329)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-samples", type=int, default=30)
+    parser.add_argument("--output", type=Path)
+    fake_postgrest.add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    secret = os.getenv("JWT_SECRET") or secrets.token_hex(32)
+    data = fake_postgrest.seed_from_args(args)
+
+    processes = [] if args.target else spawn(args, secret)
+    target = args.target or f"http://127.0.0.1:{args.port}"
+    try:
+        if processes:
+            await wait_until_up(f"http://127.0.0.1:{args.fake_port}/rest/v1/")
+        await wait_until_up(f"{target}/")
+
+        result = await drive(
+            target, data, secret,
+            concurrency=args.concurrency, duration=args.duration,
+            warmup=args.warmup, rng_seed=args.seed,
+        )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    result["config"] = {
+        key: getattr(args, key)
+        for key in ("workers", "latency", "concurrency", "duration",
+                    "users", "follows", "showcases", "messages", "seed")
+    }
+    result["machine"] = {"python": platform.python_version(), "cpus": os.cpu_count()}
+    print_report(result)
+
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+    if args.save_baseline:
+        if result["total"]["errors"]:
+            sys.exit(f"\nNot saving a baseline with {result['total']['errors']} errors")
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.baseline}")
+    elif args.baseline.exists():
+        regressions = compare(
+            result, json.loads(args.baseline.read_text()), args.tolerance, args.min_samples
+        )
+        if regressions:
+            sys.exit(f"\n{len(regressions)} route(s) regressed beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+"""
+Measures PasswordHasher throughput in hashes per second, overall and per core.
+
+    python -m benchmarks.password_hashing --hashes 64 --workers 1 2 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+from src.utils.password_hasher import PasswordHasher
+
+
+async def run(hashes: int, workers: int) -> float:
+    hasher = PasswordHasher(workers=workers, max_waiting=hashes)
+    ini = time.perf_counter()
+    stored = await asyncio.gather(*(hasher.hash(f"password-{i}") for i in range(hashes)))
+    elapsed = time.perf_counter() - ini
+
+    assert await hasher.verify(stored[0], "password-0")
+    hasher.close()
+
+    rate = hashes / elapsed
+    cores = min(workers, os.cpu_count() or 1)
+    print(
+        f"workers={workers:<3} {rate:8.1f} hashes/s  {rate / cores:8.1f} hashes/s/core  "
+        f"({stored[0].split('$')[1]})"
+    )
+    return rate
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hashes", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        await run(args.hashes, workers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Measures what a ``fields=`` projection saves on one page of a list route.
+
+For each case the PostgREST body is decoded, validated into the response
+model and rendered with ``FastJSONResponse``, once selecting every column
+into the full model and once selecting only the projected columns into the
+projection model. Bytes are reported for both legs, database to app and
+app to client, along with CPU time per request.
+
+    python -m benchmarks.projection --items 100 --repeat 500
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from benchmarks.fake_postgrest import seed
+from src.models.user import NearbyUserModel, ShowcaseModel, UserModel
+from src.utils.projection import columns, projection
+from src.utils.responses import FastJSONResponse
+
+# (label, key, table, full model, table model, projected fields)
+CASES = [
+    ("artists name+avatar", "artists", "users", UserModel, UserModel,
+     ["name", "profile_image_url"]),
+    ("artists card", "artists", "users", UserModel, UserModel,
+     ["name", "profile_image_url", "genres", "rating", "distance_km"]),
+    ("showcases grid", "showcases", "showcases", ShowcaseModel, ShowcaseModel,
+     ["media_link", "media_type"]),
+]
+
+
+def select(rows: list, select: str) -> bytes:
+    if select == "*":
+        return json.dumps(rows).encode()
+    names = select.split(",")
+    return json.dumps([{name: row.get(name) for name in names} for row in rows]).encode()
+
+
+def render(body: bytes, model, key: str) -> bytes:
+    items = [model(**row) for row in json.loads(body)]
+    return FastJSONResponse({"message": "success", key: items, "next_cursor": None}).body
+
+
+def timed(func, repeat: int) -> float:
+    func()
+    ini = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - ini) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    tables = seed(users=args.items, follows=0, showcases=1, messages=0)
+    print(f"{'case':<22}{'db bytes':>18}{'response bytes':>22}{'cpu ms/request':>22}")
+    for label, key, table, full, stored, fields in CASES:
+        rows = tables[table][: args.items]
+        model = projection(NearbyUserModel if full is UserModel else full, fields)
+
+        before_body = select(rows, "*")
+        after_body = select(rows, columns(model, "created_at", table=stored))
+        before = render(before_body, full, key)
+        after = render(after_body, model, key)
+        assert len(json.loads(after)[key]) == len(json.loads(before)[key]) == args.items
+
+        before_cpu = timed(lambda: render(before_body, full, key), args.repeat)
+        after_cpu = timed(lambda: render(after_body, model, key), args.repeat)
+        print(
+            f"{label:<22}"
+            f"{len(before_body):>8} -> {len(after_body):<7}"
+            f"{len(before):>10} -> {len(after):<9}"
+            f"{before_cpu * 1000:>9.3f} -> {after_cpu * 1000:.3f} ({before_cpu / after_cpu:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compares response serialization paths for large list responses.
+
+``jsonable_encoder`` + ``JSONResponse`` is how routes used to render pages;
+``FastJSONResponse`` serializes the same envelope with pydantic's compiled
+serializers.
+
+    python -m benchmarks.serialization --items 1000 --repeat 50
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.models import UserGenre
+from src.models.user import ShowcaseModel, UserModel, VisionBoardModel
+from src.utils.responses import FastJSONResponse
+
+
+def make_items(kind: str, count: int) -> list:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if kind == "users":
+        return [
+            UserModel(
+                name=f"User {i}", email=f"user{i}@example.com", password="x" * 60,
+                genres=UserGenre.ACTOR, rating=4.5, latitude=12.9, longitude=77.6,
+                created_at=now,
+            )
+            for i in range(count)
+        ]
+    if kind == "showcases":
+        return [
+            ShowcaseModel(
+                owner_id=uuid.uuid4(), visionboard=None, description="A showcase " * 8,
+                media_link="https://cdn.example.com/image.jpg", media_type="image",
+                created_at=now,
+            )
+            for _ in range(count)
+        ]
+    return [
+        VisionBoardModel(
+            id=uuid.uuid4(), owner_id=uuid.uuid4(), name="Board", description="Plan " * 10,
+            start_date=now, end_date=now, created_at=now,
+        )
+        for _ in range(count)
+    ]
+
+
+def timed(render, repeat: int) -> float:
+    render()
+    ini = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    return (time.perf_counter() - ini) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for kind in ("users", "showcases", "visionboards"):
+        items = make_items(kind, args.items)
+
+        def envelope(items):
+            return {"message": "success", kind: items, "next_cursor": None}
+
+        old = JSONResponse(envelope(jsonable_encoder(items))).body
+        new = FastJSONResponse(envelope(items)).body
+        assert len(json.loads(old)[kind]) == len(json.loads(new)[kind]) == args.items
+
+        before = timed(lambda: JSONResponse(envelope(jsonable_encoder(items))), args.repeat)
+        after = timed(lambda: FastJSONResponse(envelope(items)), args.repeat)
+        print(
+            f"{kind:<13} jsonable_encoder {before * 1000:8.2f} ms   "
+            f"FastJSONResponse {after * 1000:8.2f} ms   {before / after:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+A minimal local SMTP server that accepts and discards every message.
+
+It speaks just enough SMTP (no TLS, any AUTH accepted) for ``EmailQueue`` to
+deliver to it, with an optional per-command delay to mimic a remote server.
+
+    python -m benchmarks.smtp_sink --port 2525 --latency 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+
+class SMTPSink:
+    def __init__(self, host: str = "127.0.0.1", port: int = 2525, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+
+        self.messages = 0
+        self.connections = 0
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _reply(self, writer: asyncio.StreamWriter, line: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(line.encode() + b"\r\n")
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await self._reply(writer, "220 localhost ESMTP sink")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip().upper()
+
+                if command.startswith(("EHLO", "HELO")):
+                    writer.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n")
+                    await self._reply(writer, "250 8BITMIME")
+                elif command.startswith("AUTH"):
+                    await self._reply(writer, "235 2.7.0 Authentication successful")
+                elif command == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    await self._reply(writer, "250 OK queued")
+                elif command == "QUIT":
+                    await self._reply(writer, "221 Bye")
+                    break
+                else:
+                    await self._reply(writer, "250 OK")
+        finally:
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.latency)
+    await sink.start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
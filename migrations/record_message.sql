@@ -0,0 +1,30 @@
+-- Updates both sides of a conversation for a new message in one statement,
+-- called by UserHandler.create_message. The receiver's unread_count is
+-- incremented in place rather than read and written back, and the last
+-- message only moves forward, so concurrent sends can neither lose a count
+-- nor leave an older message as the preview.
+--
+-- Apply once, e.g. with psql or the Supabase SQL editor. Safe to re-run.
+
+create or replace function record_message(
+    sender uuid,
+    receiver uuid,
+    preview text,
+    sent_at timestamptz
+) returns void
+language sql as $$
+    insert into conversations as c (
+        user_id, counterpart_id, last_message, last_sender_id, last_message_at, unread_count
+    )
+    select v.user_id, v.counterpart_id, preview, sender, sent_at, v.unread
+    from (values (sender, receiver, 0), (receiver, sender, 1)) as v (user_id, counterpart_id, unread)
+    -- a message to oneself has a single conversation row
+    where v.unread = 0 or sender <> receiver
+    on conflict (user_id, counterpart_id) do update set
+        unread_count = c.unread_count + excluded.unread_count,
+        last_message = case when c.last_message_at is null or excluded.last_message_at >= c.last_message_at
+            then excluded.last_message else c.last_message end,
+        last_sender_id = case when c.last_message_at is null or excluded.last_message_at >= c.last_message_at
+            then excluded.last_sender_id else c.last_sender_id end,
+        last_message_at = greatest(c.last_message_at, excluded.last_message_at);
+$$;
@@ -0,0 +1,51 @@
+-- Like, bookmark and comment totals kept on each showcase by triggers, so
+-- reading a showcase's totals is part of reading the showcase rather than
+-- three counts per request. The buffered like and bookmark writes upsert
+-- with on conflict do nothing and delete only rows that exist, so each
+-- trigger fires exactly once per change in presence.
+--
+-- Apply once, e.g. with psql or the Supabase SQL editor. Safe to re-run.
+
+begin;
+
+alter table showcases
+    add column if not exists like_count integer not null default 0,
+    add column if not exists bookmark_count integer not null default 0,
+    add column if not exists comment_count integer not null default 0;
+
+create or replace function count_showcase_rows() returns trigger
+language plpgsql as $$
+begin
+    if tg_op = 'INSERT' then
+        execute format('update showcases set %1$I = %1$I + 1 where id = $1', tg_argv[0])
+            using new.showcase_id;
+    else
+        execute format('update showcases set %1$I = greatest(%1$I - 1, 0) where id = $1', tg_argv[0])
+            using old.showcase_id;
+    end if;
+    return null;
+end
+$$;
+
+drop trigger if exists count_likes on "ShowCaseLikeModel";
+create trigger count_likes after insert or delete on "ShowCaseLikeModel"
+    for each row execute function count_showcase_rows('like_count');
+
+drop trigger if exists count_bookmarks on "ShowCaseBookmarkModel";
+create trigger count_bookmarks after insert or delete on "ShowCaseBookmarkModel"
+    for each row execute function count_showcase_rows('bookmark_count');
+
+drop trigger if exists count_comments on comments;
+create trigger count_comments after insert or delete on comments
+    for each row execute function count_showcase_rows('comment_count');
+
+-- rows written before the triggers existed; the locks keep writes from
+-- landing between the recount and the commit
+lock table "ShowCaseLikeModel", "ShowCaseBookmarkModel", comments in share mode;
+
+update showcases s set
+    like_count = (select count(*) from "ShowCaseLikeModel" l where l.showcase_id = s.id),
+    bookmark_count = (select count(*) from "ShowCaseBookmarkModel" b where b.showcase_id = s.id),
+    comment_count = (select count(*) from comments c where c.showcase_id = s.id);
+
+commit;
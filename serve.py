@@ -0,0 +1,81 @@
+"""
+Production entry point.
+
+Runs ``WORKERS`` uvicorn worker processes, each with its own event loop and
+its own ``UserHandler`` initialised by the app's lifespan handler. On SIGTERM
+every worker stops accepting connections, lets in-flight requests finish for
+up to ``GRACEFUL_TIMEOUT`` seconds and then runs the lifespan shutdown, which
+flushes buffered writes and queued mail.
+
+With more than one worker each writes its own ``logs/log.<n>.log``, ``n``
+being the lowest number no running worker holds, so a restarted worker
+carries on with the files of the one it replaces.
+Metrics are kept per worker as well: ``/metrics`` reports the worker that
+happened to answer, with every series labelled ``worker="<pid>"``. Scrape
+each worker, or sum over ``worker`` once scraped, for process-wide totals.
+
+    python serve.py
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOST = os.environ["HOST"]
+PORT = int(os.environ["PORT"])
+
+WORKERS = int(os.getenv("WORKERS", os.cpu_count() or 1))
+BACKLOG = int(os.getenv("BACKLOG", 2048))
+KEEP_ALIVE = int(os.getenv("KEEP_ALIVE", 5))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+LIMIT_CONCURRENCY = int(os.getenv("LIMIT_CONCURRENCY", 0)) or None
+PROXY_HEADERS = os.getenv("PROXY_HEADERS", "true").lower() != "false"
+ACCESS_LOG = os.getenv("ACCESS_LOG", "false").lower() == "true"
+
+
+def _available(module: str) -> bool:
+    return os.name != "nt" and importlib.util.find_spec(module) is not None
+
+
+if __name__ == "__main__":
+    if WORKERS > 1 and os.getenv("OTP_STORE", "memory") == "memory":
+        print(
+            "warning: OTP_STORE=memory keeps codes per worker, "
+            "set OTP_STORE=file:<path> so any worker can verify them"
+        )
+    if WORKERS > 1 and os.getenv("MESSAGE_BROKER", "memory") == "memory":
+        print(
+            "warning: MESSAGE_BROKER=memory only reaches sockets held by the "
+            "sending worker, real-time messages will be missed"
+        )
+    if WORKERS > 1:
+        print(
+            "warning: in-memory caches and indexes are per worker, changes "
+            "made through another worker show up late: user profiles after "
+            "USER_CACHE_TTL, ETags after ETAG_CACHE_TTL, near-by artists "
+            "after GEO_INDEX_RELOAD_INTERVAL, follow counts after "
+            "FOLLOW_GRAPH_RELOAD_INTERVAL; /metrics reports one worker per "
+            "scrape"
+        )
+        # one rotating log file per worker, see src/utils/log.py
+        os.environ.setdefault("LOG_FILE_PER_WORKER", "true")
+
+    uvicorn.run(
+        "src:app",
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        loop="uvloop" if _available("uvloop") else "asyncio",
+        http="httptools" if _available("httptools") else "h11",
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEP_ALIVE,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        limit_concurrency=LIMIT_CONCURRENCY,
+        proxy_headers=PROXY_HEADERS,
+        access_log=ACCESS_LOG,
+    )
@@ -1,11 +1,24 @@
 from __future__ import annotations
 
 import os
+from contextlib import asynccontextmanager
+from typing import Optional
 
+import jwt
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request, WebSocket
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from src.utils import UserHandler  # type: ignore  # noqa
+from src.utils import Token, TokenHandler, UserHandler  # type: ignore  # noqa
+from src.utils.email_handler import email_queue
+from src.utils.message_hub import message_hub
+from src.utils.metrics import MetricsMiddleware
+from src.utils.pagination import InvalidCursorError
+from src.utils.password_hasher import PasswordHasherBusy
+from src.utils.projection import InvalidFieldsError
+from src.utils.responses import FastJSONResponse
+from src.utils.uploads import UploadError, uploads
+from src.utils.user_loader import UserLoaderMiddleware
 
 load_dotenv()
 user_handler = UserHandler()
@@ -13,11 +26,80 @@ user_handler = UserHandler()
 HOST = os.environ["HOST"]
 PORT = os.environ["PORT"]
 
+token_handler = TokenHandler(os.environ["JWT_SECRET"])
+security = HTTPBearer()
 
-async def startup():
+
+def get_user_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> Token:
+    try:
+        return token_handler.decode_token(credentials.credentials)
+    except jwt.InvalidTokenError:
+        raise HTTPException(401, "Invalid or expired token")
+
+
+def get_socket_token(websocket: WebSocket) -> Optional[Token]:
+    """
+    Reads the bearer token of a WebSocket handshake from the Authorization
+    header or, for clients that cannot set headers, a ``token`` query
+    parameter. Returns None when it is missing or invalid.
+    """
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        credentials = websocket.query_params.get("token", "")
+    try:
+        return token_handler.decode_token(credentials)
+    except jwt.InvalidTokenError:
+        return None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # runs once in every worker process
     await user_handler.init()
+    email_queue.start()
+    await message_hub.start()
+    uploads.start()
+    try:
+        yield
+    finally:
+        await uploads.stop()
+        await message_hub.close()
+        await email_queue.close()
+        await user_handler.close()
+
+
+app = FastAPI(
+    title="Creatist API Documentation",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+app.add_middleware(UserLoaderMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError):
+    return FastJSONResponse({"detail": str(exc)}, status_code=400)
+
+
+@app.exception_handler(InvalidFieldsError)
+async def invalid_fields_handler(request: Request, exc: InvalidFieldsError):
+    return FastJSONResponse({"detail": str(exc)}, status_code=400)
+
+
+@app.exception_handler(UploadError)
+async def upload_error_handler(request: Request, exc: UploadError):
+    content = {"detail": str(exc)}
+    if exc.offset is not None:
+        content["offset"] = exc.offset
+    return FastJSONResponse(content, status_code=exc.status_code)
+
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return FastJSONResponse({"detail": str(exc)}, status_code=503)
 
-app = FastAPI(title="Creatist API Documentation", on_startup=[startup])
 
 from .routes import *  # 
@@ -2,4 +2,4 @@ from __future__ import annotations
 
 from .enums import *  # noqa
 from .user import *  # noqa
-
+from .upload import *  # noqa
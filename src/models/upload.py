@@ -0,0 +1,33 @@
+from __future__ import annotations
+import datetime
+
+from pydantic import BaseModel, Field
+import uuid
+from typing import Optional
+from src.models import MediaType
+
+
+class UploadCreate(BaseModel):
+    media_type: MediaType
+    size: int = Field(gt=0)
+    content_type: Optional[str] = None
+    filename: Optional[str] = None
+
+
+class UploadSession(BaseModel):
+    id: uuid.UUID
+    owner_id: uuid.UUID
+    media_type: MediaType
+    size: int
+    offset: int = 0
+    chunk_size: int
+    content_type: Optional[str] = None
+    extension: str = ""
+    expires_at: datetime.datetime
+
+
+class UploadComplete(BaseModel):
+    # attach to an existing showcase, or create one from the fields below
+    showcase_id: Optional[uuid.UUID] = None
+    visionboard: Optional[uuid.UUID] = None
+    description: Optional[str] = None
@@ -6,19 +6,36 @@ import uuid
 from typing import Optional
 from src.models import UserGenre, WorkMode, PaymentMode
 
-class UserModel(BaseModel):
+class PublicUserModel(BaseModel):
+    """
+    A user as other users see them, without their password.
+    """
     id: uuid.UUID = Field(default_factory=lambda: uuid.uuid4())
 
     name: str
     email: str
-    password: str
 
     profile_image_url: Optional[str] = None
     age: Optional[int] = None
     genres: Optional[UserGenre] = None
     payment_mode: Optional[PaymentMode] = None
     work_mode: Optional[WorkMode] = None
-    
+
+    # set by the server, ignored when a user is created or updated
+    rating: Optional[float] = None
+
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    created_at: Optional[datetime.datetime] = None
+
+
+class UserModel(PublicUserModel):
+    password: str
+
+
+class NearbyUserModel(PublicUserModel):
+    distance_km: Optional[float] = None
 
 
 class ShowcaseModel(BaseModel):
@@ -28,6 +45,15 @@ class ShowcaseModel(BaseModel):
     description: Optional[str] = None
     media_link: Optional[str] = None
     media_type: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+
+
+class ShowcaseDetailModel(ShowcaseModel):
+    like_count: int = 0
+    comment_count: int = 0
+    bookmark_count: int = 0
+    liked: bool = False
+    bookmarked: bool = False
 
 
 class ShowCaseLikeModel(BaseModel):
@@ -59,6 +85,7 @@ class VisionBoardModel(BaseModel):
     description: str
     start_date: datetime.datetime
     end_date: datetime.datetime
+    created_at: Optional[datetime.datetime] = None
 
 
 class VisionBoardRoleModel(BaseModel):
@@ -75,6 +102,16 @@ class VisionBoardTaskModel(BaseModel):
     end_date: datetime.datetime
 
 
+class ConversationModel(BaseModel):
+    user_id: uuid.UUID
+    counterpart_id: uuid.UUID
+    last_message: str
+    last_sender_id: uuid.UUID
+    last_message_at: datetime.datetime
+    unread_count: int = 0
+    counterpart: Optional[PublicUserModel] = None
+
+
 class FollowerModel(BaseModel):
     user_id: uuid.UUID
     following_id: uuid.UUID
@@ -2,3 +2,4 @@ from .auth import *  # noqa
 from .root import *  # noqa
 from .user import *  # noqa
 from .otp import *  # noqa
+from .upload import *  # noqa
@@ -1,18 +1,15 @@
 from __future__ import annotations
 
-import os
-
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, EmailStr
 
-from src.app import app, user_handler
-from src.models import UserModel
-from src.utils import Token, TokenHandler
+from src.app import app, get_user_token, token_handler, user_handler
+from src.models import PublicUserModel, UserModel
+from src.utils import Token
+from src.utils.projection import project
+from src.utils.responses import FastJSONResponse
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
-JWT_SECRET = os.environ["JWT_SECRET"]
 
 
 class Credential(BaseModel):
@@ -20,39 +17,35 @@ class Credential(BaseModel):
     password: str
 
 
-token_handler = TokenHandler(os.environ["JWT_SECRET"])
-security = HTTPBearer()
-
-
-def get_user_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return token_handler.decode_token(credentials.credentials)
-
-
 @router.post("/signin")
-async def signin_route(request: Request, credential: Credential) -> JSONResponse:
+async def signin_route(request: Request, credential: Credential) -> FastJSONResponse:
     user = await user_handler.fetch_user(
         email=credential.email, password=credential.password
     )
+    if user is None:
+        raise HTTPException(401, "Invalid credentials")
     token = token_handler.create_access_token(user)
 
-    return JSONResponse({"message": "success", "token": token})
+    return FastJSONResponse({"message": "success", "token": token})
 
 
 @router.post("/signup")
-async def signup_route(request: Request, user: UserModel) -> JSONResponse:
-    _user = await user_handler.fetch_user(email=user.email, password=user.password)
+async def signup_route(request: Request, user: UserModel) -> FastJSONResponse:
+    _user = await user_handler.fetch_user(email=user.email)
     if _user is not None:
         raise HTTPException(400, "User already exists")
 
     await user_handler.create_user(user=user)
 
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 
 @router.get("/fetch")
-async def fetch_user_route(token: Token = Depends(get_user_token)) -> UserModel:
+async def fetch_user_route(token: Token = Depends(get_user_token)) -> PublicUserModel:
     user = await user_handler.fetch_user(user_id=token.sub)
-    return user
+    if user is None:
+        raise HTTPException(404, "User not found")
+    return FastJSONResponse(project(user, PublicUserModel))
 
 
 @router.post("/refresh")
@@ -60,19 +53,19 @@ async def refresh_route(token: Token = Depends(get_user_token)) -> UserModel:
     user = await user_handler.fetch_user(user_id=token.sub)
     token = token_handler.create_access_token(user)
 
-    return JSONResponse({"message": "success", "token": token})
+    return FastJSONResponse({"message": "success", "token": token})
 
 
 @router.post("/update")
 async def update_user_route(
     user: UserModel, token: Token = Depends(get_user_token)
-) -> UserModel:
+) -> PublicUserModel:
     updated_user = await user_handler.update_user(
         user_id=token.sub, update_payload=user
     )
     if updated_user is None:
         raise HTTPException(400, "Failed to update User")
-    return updated_user
+    return FastJSONResponse(project(updated_user, PublicUserModel))
 
 
 app.include_router(router)
@@ -1,24 +1,16 @@
 from __future__ import annotations
 
-import os
-from fastapi import APIRouter, Depends, Request
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional
 from src.app import app
 from src.utils.email_handler import send_otp_mail
-from src.utils import TokenHandler, token_handler
-import random
+from src.utils.otp_store import OTPStore, get_otp_store
+import secrets
 
 router = APIRouter(prefix="/auth/otp", tags=["OTP Authentication"])
-JWT_SECRET = os.environ["JWT_SECRET"]
-token_handler = TokenHandler(JWT_SECRET)
-security = HTTPBearer()
-
-
-
-def get_user_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return token_handler.decode_token(credentials.credentials)
 
 
 class StatusUpdate(BaseModel):
@@ -31,29 +23,35 @@ class OTPRequest(BaseModel):
 
 
 class OTPHandler:
-    def __init__(self):
-        self.otps = {}
+    def __init__(self, store: OTPStore):
+        self.store = store
 
-    def generate_otp(self, email_address: str) -> str:
-        otp = random.randint(100000, 999999)
-        self.otps[email_address] = otp
-        return str(otp)
-    
-    def verify_otp(self, email_address: str, otp: int) -> bool:
-        return self.otps.get(email_address) == int(otp)
-    
-otp_handler = OTPHandler()
+    async def generate_otp(self, email_address: str) -> str:
+        otp = str(secrets.randbelow(900000) + 100000)
+        await self.store.set(email_address, otp)
+        return otp
+
+    async def verify_otp(self, email_address: str, otp: Optional[str]) -> bool:
+        if otp is None:
+            return False
+        # codes are single use
+        return await self.store.consume(email_address, str(otp).strip())
+
+otp_handler = OTPHandler(get_otp_store())
     
 
 @router.post("")
 async def send_otp(request: Request, data: OTPRequest):
     email_address = data.email_address
 
-    otp = otp_handler.generate_otp(email_address=email_address)
-    await send_otp_mail(
-        email_address=email_address,
-        otp=otp,
-    )
+    otp = await otp_handler.generate_otp(email_address=email_address)
+    try:
+        await send_otp_mail(
+            email_address=email_address,
+            otp=otp,
+        )
+    except asyncio.QueueFull:
+        raise HTTPException(503, "Too many pending emails, try again shortly")
 
     return True
 
@@ -66,7 +64,7 @@ async def verify_otp(
     email_address = data.email_address
     otp = data.otp
 
-    if not otp_handler.verify_otp(email_address=email_address, otp=otp):
+    if not await otp_handler.verify_otp(email_address=email_address, otp=otp):
         return False
 
     return True
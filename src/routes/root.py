@@ -1,24 +1,92 @@
 from __future__ import annotations
 
-from time import perf_counter
+import asyncio
 
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 
 from src.app import app, user_handler
+from src.utils.email_handler import email_queue
+from src.utils.health import health
+from src.utils.log import writer
+from src.utils.message_hub import message_hub
+from src.utils.metrics import registry
+from src.utils.responses import FastJSONResponse
+
+# read at scrape time; a gauge whose source is not ready yet is skipped
+registry.gauge("supabase_pool_size", "Concurrent Supabase requests allowed.",
+               lambda: user_handler.http_pool.size)
+registry.gauge("supabase_pool_in_use", "Supabase requests in flight.",
+               lambda: user_handler.http_pool.in_use)
+registry.gauge("supabase_pool_waiting", "Supabase requests waiting for a slot.",
+               lambda: user_handler.http_pool.waiting)
+registry.gauge("supabase_pool_wait_seconds_total", "Time spent waiting for a slot.",
+               lambda: user_handler.http_pool.wait_total)
+registry.gauge("supabase_pool_timeouts_total", "Requests that gave up waiting for a slot.",
+               lambda: user_handler.http_pool.timeouts)
+registry.gauge("password_hash_in_flight", "Passwords being hashed or verified.",
+               lambda: user_handler.password_hasher.in_flight)
+registry.gauge("password_hash_waiting", "Password hashes waiting for a worker.",
+               lambda: user_handler.password_hasher.waiting)
+registry.gauge("write_buffer_pending", "Buffered interaction writes not yet flushed.",
+               lambda: sum(map(len, user_handler.write_buffer.pending.values())))
+registry.gauge("user_cache_hits_total", "User cache hits.",
+               lambda: user_handler.user_cache.hits)
+registry.gauge("user_cache_misses_total", "User cache misses.",
+               lambda: user_handler.user_cache.misses)
+registry.gauge("email_queue_depth", "OTP mails waiting to be sent.",
+               lambda: email_queue.depth)
+registry.gauge("message_sockets_open", "Open real-time message sockets.",
+               lambda: message_hub.open)
+registry.gauge("message_sockets_evicted_total", "Sockets closed because their send queue was full.",
+               lambda: message_hub.evicted)
+registry.gauge("log_dropped_total", "Log records dropped on a full queue or a formatting error.",
+               lambda: writer.dropped)
 
 
 @app.route("/")
-def root(request: Request) -> JSONResponse:
-    return JSONResponse(
+def root(request: Request) -> FastJSONResponse:
+    return FastJSONResponse(
         {"message": "API for Creatist iOS Application"}, status_code=200
     )
 
 
+async def supabase_probe():
+    await user_handler.supabase.table("users").select("id").limit(1).execute()
+
+
+async def smtp_probe():
+    _, connection = await asyncio.open_connection(email_queue.hostname, email_queue.port)
+    connection.close()
+    await connection.wait_closed()
+
+
+health.add("supabase", supabase_probe)
+# OTP mail degrades on its own; the rest of the API keeps serving
+health.add("smtp", smtp_probe, critical=False)
+
+
 @app.route("/ping")
-async def root(request: Request) -> JSONResponse:
-    ini = perf_counter()
-    _ = await user_handler.supabase.table("users").select("*").execute()
-    fin = perf_counter() - ini
+async def root(request: Request) -> FastJSONResponse:
+    await health.refresh()
+    return FastJSONResponse(
+        {"message": "success", "response_time": health.probes["supabase"].latency}
+    )
+
+
+@app.get("/health/live", include_in_schema=False)
+async def liveness() -> FastJSONResponse:
+    return FastJSONResponse({"status": "ok"})
+
 
-    return JSONResponse({"message": "success", "response_time": fin})
+@app.get("/health/ready", include_in_schema=False)
+async def readiness() -> FastJSONResponse:
+    status = await health.status()
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
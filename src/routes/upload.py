@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+import uuid
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.staticfiles import StaticFiles
+
+from src.app import app, get_user_token, user_handler
+from src.models.upload import UploadComplete, UploadCreate
+from src.models.user import ShowcaseModel
+from src.utils import Token
+from src.utils.responses import FastJSONResponse
+from src.utils.storage import LocalStorage
+from src.utils.uploads import uploads
+
+router = APIRouter(prefix="/v1/upload", tags=["Uploads"])
+
+
+class MediaFiles(StaticFiles):
+    """
+    Published media. Browsers are told not to sniff the type and not to run
+    anything in the file, whatever a client managed to upload.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["Content-Security-Policy"] = "default-src 'none'; sandbox"
+        return response
+
+
+@router.post("")
+async def create_upload(request: Request, upload: UploadCreate, token: Token = Depends(get_user_token)):
+    session = await uploads.create(owner_id=token.sub, upload=upload)
+    return FastJSONResponse({"message": "success", "upload": session}, status_code=201)
+
+@router.get("/{upload_id}")
+async def get_upload(request: Request, upload_id: uuid.UUID, token: Token = Depends(get_user_token)):
+    session = await uploads.get(upload_id=upload_id, owner_id=token.sub)
+    return FastJSONResponse({"message": "success", "upload": session})
+
+@router.put("/{upload_id}")
+async def upload_chunk(
+    request: Request,
+    upload_id: uuid.UUID,
+    offset: int = Query(ge=0),
+    checksum: str = Header(alias="X-Chunk-SHA256", description="Hex SHA-256 of the chunk"),
+    token: Token = Depends(get_user_token),
+):
+    # the body is streamed to storage, never read into memory whole
+    session = await uploads.write_chunk(
+        upload_id=upload_id, owner_id=token.sub, offset=offset,
+        checksum=checksum, chunks=request.stream(),
+    )
+    return FastJSONResponse({"message": "success", "upload": session})
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(request: Request, upload_id: uuid.UUID, body: UploadComplete, token: Token = Depends(get_user_token)):
+    if body.showcase_id is not None:
+        # checked first so a bad id does not publish media nobody points to
+        existing = await user_handler.get_showcase(showcase_id=body.showcase_id)
+        if existing is None or existing.owner_id != token.sub:
+            raise HTTPException(404, "Showcase not found")
+
+    session, url = await uploads.complete(upload_id=upload_id, owner_id=token.sub)
+    if body.showcase_id is not None:
+        showcase = await user_handler.attach_showcase_media(
+            showcase_id=body.showcase_id, user_id=token.sub,
+            media_link=url, media_type=session.media_type,
+        )
+        if showcase is None:
+            raise HTTPException(404, "Showcase not found")
+    else:
+        showcase = ShowcaseModel(
+            owner_id=token.sub, visionboard=body.visionboard, description=body.description,
+            media_link=url, media_type=session.media_type.value,
+        )
+        await user_handler.create_showcase(showcase=showcase, user_id=token.sub)
+    return FastJSONResponse({"message": "success", "showcase": showcase})
+
+@router.delete("/{upload_id}")
+async def abort_upload(request: Request, upload_id: uuid.UUID, token: Token = Depends(get_user_token)):
+    await uploads.abort(upload_id=upload_id, owner_id=token.sub)
+    return FastJSONResponse({"message": "success"})
+
+
+app.include_router(router)
+
+if isinstance(uploads.storage, LocalStorage):
+    # published media is served by the app itself when stored locally
+    os.makedirs(uploads.storage.media_dir, exist_ok=True)
+    app.mount(uploads.storage.base_url, MediaFiles(directory=uploads.storage.media_dir), name="media")
@@ -1,33 +1,76 @@
 from __future__ import annotations
 
-import os
-
-from fastapi import Request, APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-
-from src.app import app, user_handler
-from src.utils import Token, TokenHandler
+import uuid
+from typing import List, Optional
+
+from fastapi import Request, APIRouter, Depends, HTTPException, Query, WebSocket
+from pydantic import BaseModel, Field
+
+from src.app import app, get_socket_token, get_user_token, token_handler, user_handler
+from src.models import PaymentMode, UserGenre, WorkMode
+from src.utils import Token
+from src.utils.etag import REVALIDATE, SHORT_LIVED, conditional_response, etag_matches, not_modified
+from src.utils.message_hub import message_hub
+from src.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, iterate_pages
+from src.utils.projection import project
+from src.utils.responses import FastJSONResponse, NDJSONResponse, wants_ndjson
 from src.models.user import (
-    UserModel, ShowcaseModel, CommentModel, VisionBoardModel,
+    PublicUserModel, UserModel, ShowcaseModel, CommentModel, VisionBoardModel,
     VisionBoardTaskModel
 )
 
 router = APIRouter(prefix="/v1", tags=["Users"])
-JWT_SECRET = os.environ["JWT_SECRET"]
-
-token_handler = TokenHandler(os.environ["JWT_SECRET"])
-security = HTTPBearer()
-
+PageLimit = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+
+def field_list(
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, id is always included"),
+) -> Optional[List[str]]:
+    return [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+
+
+class ShowcaseBatch(BaseModel):
+    showcase_ids: List[uuid.UUID] = Field(min_length=1, max_length=MAX_PAGE_SIZE)
+
+
+async def page_response(request: Request, key: str, fetch, *, cursor: Optional[str], limit: int):
+    """
+    Returns one page as JSON, or with ``Accept: application/x-ndjson`` every
+    item from ``cursor`` onwards streamed one per line, read in pages of
+    ``MAX_PAGE_SIZE``. ``fetch(cursor, limit)`` returns a ``Page``.
+    """
+    if wants_ndjson(request):
+        # fetched up front so a bad cursor is still a 400, not a broken stream
+        first = await fetch(cursor, MAX_PAGE_SIZE)
+        return NDJSONResponse(
+            iterate_pages(lambda next_cursor: fetch(next_cursor, MAX_PAGE_SIZE), first)
+        )
+    page = await fetch(cursor, limit)
+    return FastJSONResponse({"message": "success", key: page.items, "next_cursor": page.next_cursor})
+
+
+async def conditional(request: Request, resource, variant, render, *, cache_control: str = REVALIDATE):
+    """
+    Answers with a 304 straight away when the client holds the ETag last
+    served for ``resource``; otherwise awaits ``render()`` for the content
+    and responds with an ETag, or a 304 if the content is unchanged.
+    """
+    etags = user_handler.etags
+    etag = etags.get(resource, variant)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    since = etags.generation(resource)
+    return conditional_response(
+        request, await render(), cache_control=cache_control,
+        etags=etags, resource=resource, variant=variant, since=since,
+    )
 
-def get_user_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    return token_handler.decode_token(credentials.credentials)
 
 # User Management APIs
 @router.post("/create")
 async def create_user(request: Request, user: UserModel):
     await user_handler.create_user(user=user)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.post("/login")
 async def login_user(request: Request, email: str, password: str):
@@ -35,158 +78,275 @@ async def login_user(request: Request, email: str, password: str):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = token_handler.create_access_token(user)
-    return JSONResponse({"message": "success", "token": token})
+    return FastJSONResponse({"message": "success", "token": token})
 
 @router.put("/update")
 async def update_user(request: Request, user: UserModel, token: Token = Depends(get_user_token)):
     updated_user = await user_handler.update_user(user_id=token.sub, update_payload=user)
-    return JSONResponse({"message": "success", "user": updated_user})
+    if updated_user is not None:
+        updated_user = project(updated_user, PublicUserModel)
+    return FastJSONResponse({"message": "success", "user": updated_user})
 
 # Follower Management APIs
 @router.get("/followers")
-async def get_followers(request: Request, token: Token = Depends(get_user_token)):
-    followers = await user_handler.get_followers(user_id=token.sub)
-    return JSONResponse({"message": "success", "followers": followers})
+async def get_followers(request: Request, cursor: Optional[str] = None, limit: int = PageLimit, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    return await page_response(
+        request, "followers",
+        lambda cursor, limit: user_handler.get_followers(user_id=token.sub, cursor=cursor, limit=limit, fields=fields),
+        cursor=cursor, limit=limit,
+    )
 
 @router.get("/following")
-async def get_following(request: Request, token: Token = Depends(get_user_token)):
-    following = await user_handler.get_following(user_id=token.sub)
-    return JSONResponse({"message": "success", "following": following})
+async def get_following(request: Request, cursor: Optional[str] = None, limit: int = PageLimit, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    return await page_response(
+        request, "following",
+        lambda cursor, limit: user_handler.get_following(user_id=token.sub, cursor=cursor, limit=limit, fields=fields),
+        cursor=cursor, limit=limit,
+    )
 
 @router.put("/follow/{user_id}")
-async def follow_user(request: Request, user_id: str, token: Token = Depends(get_user_token)):
+async def follow_user(request: Request, user_id: uuid.UUID, token: Token = Depends(get_user_token)):
     await user_handler.follow(following_id=user_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.put("/unfollow/{user_id}")
-async def unfollow_user(request: Request, user_id: str, token: Token = Depends(get_user_token)):
+async def unfollow_user(request: Request, user_id: uuid.UUID, token: Token = Depends(get_user_token)):
     await user_handler.unfollow(following_id=user_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
+
+@router.get("/user/{user_id}/follow-stats")
+async def get_follow_stats(request: Request, user_id: uuid.UUID, token: Token = Depends(get_user_token)):
+    stats = user_handler.get_follow_stats(user_id=user_id)
+    return FastJSONResponse({"message": "success", **stats})
+
+@router.get("/is-following/{user_id}")
+async def is_following(request: Request, user_id: uuid.UUID, token: Token = Depends(get_user_token)):
+    following = user_handler.is_following(user_id=token.sub, following_id=user_id)
+    return FastJSONResponse({"message": "success", "is_following": following})
+
+@router.get("/mutuals")
+async def get_mutuals(request: Request, limit: int = PageLimit, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    mutuals = await user_handler.get_mutuals(user_id=token.sub, limit=limit, fields=fields)
+    return FastJSONResponse({"message": "success", "mutuals": mutuals})
+
+@router.get("/user/{user_id}/mutuals")
+async def get_followed_by_following(request: Request, user_id: uuid.UUID, limit: int = PageLimit, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    mutuals = await user_handler.get_followed_by_following(viewer_id=token.sub, user_id=user_id, limit=limit, fields=fields)
+    return FastJSONResponse({"message": "success", "mutuals": mutuals})
 
 # Message APIs
 @router.get("/message/users")
-async def get_message_users(request: Request, token: Token = Depends(get_user_token)):
-    users = await user_handler.get_message_users(user_id=token.sub)
-    return JSONResponse({"message": "success", "users": users})
+async def get_message_users(request: Request, cursor: Optional[str] = None, limit: int = PageLimit, token: Token = Depends(get_user_token)):
+    return await page_response(
+        request, "conversations",
+        lambda cursor, limit: user_handler.get_message_users(user_id=token.sub, cursor=cursor, limit=limit),
+        cursor=cursor, limit=limit,
+    )
+
+@router.websocket("/message/ws")
+async def message_socket(websocket: WebSocket):
+    token = get_socket_token(websocket)
+    if token is None:
+        # rejects the handshake with a 403
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    await message_hub.serve(token.sub, websocket)
 
 @router.post("/message/{user_id}/create")
-async def create_message(request: Request, user_id: str, message: str, token: Token = Depends(get_user_token)):
+async def create_message(request: Request, user_id: uuid.UUID, message: str, token: Token = Depends(get_user_token)):
     await user_handler.create_message(sender_id=token.sub, receiver_id=user_id, message=message)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.get("/message/{user_id}/{limit}")
-async def get_messages(request: Request, user_id: str, limit: int, token: Token = Depends(get_user_token)):
-    messages = await user_handler.get_messages(user_id=token.sub, other_user_id=user_id, limit=limit)
-    return JSONResponse({"message": "success", "messages": messages})
+async def get_messages(request: Request, user_id: uuid.UUID, limit: int, cursor: Optional[str] = None, token: Token = Depends(get_user_token)):
+    return await page_response(
+        request, "messages",
+        lambda cursor, limit: user_handler.get_messages(user_id=token.sub, other_user_id=user_id, limit=limit, cursor=cursor),
+        cursor=cursor, limit=limit,
+    )
 
 # Showcase APIs
 @router.get("/showcases")
-async def get_showcases(request: Request, token: Token = Depends(get_user_token)):
-    showcases = await user_handler.get_showcases(user_id=token.sub)
-    return JSONResponse({"message": "success", "showcases": showcases})
+async def get_showcases(request: Request, cursor: Optional[str] = None, limit: int = PageLimit, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    return await page_response(
+        request, "showcases",
+        lambda cursor, limit: user_handler.get_showcases(user_id=token.sub, cursor=cursor, limit=limit, fields=fields),
+        cursor=cursor, limit=limit,
+    )
 
 @router.post("/showcase/create")
 async def create_showcase(request: Request, showcase: ShowcaseModel, token: Token = Depends(get_user_token)):
     await user_handler.create_showcase(showcase=showcase, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.get("/showcase/{showcase_id}")
-async def get_showcase(request: Request, showcase_id: str, token: Token = Depends(get_user_token)):
-    showcase = await user_handler.get_showcase(showcase_id=showcase_id)
-    return JSONResponse({"message": "success", "showcase": showcase})
+async def get_showcase(request: Request, showcase_id: uuid.UUID, token: Token = Depends(get_user_token)):
+    async def render():
+        showcase = await user_handler.get_showcase(showcase_id=showcase_id)
+        return {"message": "success", "showcase": showcase}
+
+    # keyed like the invalidations, by the canonical form of the id
+    return await conditional(request, ("showcase", str(showcase_id)), (), render)
+
+@router.get("/showcase/{showcase_id}/detail")
+async def get_showcase_detail(request: Request, showcase_id: uuid.UUID, token: Token = Depends(get_user_token)):
+    showcase = await user_handler.get_showcase_detail(showcase_id=showcase_id, viewer_id=token.sub)
+    if showcase is None:
+        raise HTTPException(404, "Showcase not found")
+    return FastJSONResponse({"message": "success", "showcase": showcase})
 
 @router.put("/showcase/{showcase_id}/update")
-async def update_showcase(request: Request, showcase_id: str, showcase: ShowcaseModel, token: Token = Depends(get_user_token)):
+async def update_showcase(request: Request, showcase_id: uuid.UUID, showcase: ShowcaseModel, token: Token = Depends(get_user_token)):
     await user_handler.update_showcase(showcase_id=showcase_id, showcase=showcase, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.delete("/showcase/{showcase_id}/delete")
-async def delete_showcase(request: Request, showcase_id: str, token: Token = Depends(get_user_token)):
+async def delete_showcase(request: Request, showcase_id: uuid.UUID, token: Token = Depends(get_user_token)):
     await user_handler.delete_showcase(showcase_id=showcase_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 # Showcase Interaction APIs
 @router.put("/showcase/{showcase_id}/like")
-async def like_showcase(request: Request, showcase_id: str, token: Token = Depends(get_user_token)):
+async def like_showcase(request: Request, showcase_id: uuid.UUID, token: Token = Depends(get_user_token)):
     await user_handler.like_showcase(showcase_id=showcase_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.put("/showcase/{showcase_id}/unlike")
-async def unlike_showcase(request: Request, showcase_id: str, token: Token = Depends(get_user_token)):
+async def unlike_showcase(request: Request, showcase_id: uuid.UUID, token: Token = Depends(get_user_token)):
     await user_handler.unlike_showcase(showcase_id=showcase_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.post("/showcase/{showcase_id}/comment")
-async def create_comment(request: Request, showcase_id: str, comment: CommentModel, token: Token = Depends(get_user_token)):
+async def create_comment(request: Request, showcase_id: uuid.UUID, comment: CommentModel, token: Token = Depends(get_user_token)):
     await user_handler.create_comment(showcase_id=showcase_id, comment=comment, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.put("/showcase/{showcase_id}/comment/{comment_id}/upvote")
 async def upvote_comment(request: Request, showcase_id: str, comment_id: str, token: Token = Depends(get_user_token)):
     await user_handler.upvote_comment(comment_id=comment_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.put("/showcase/{showcase_id}/comment/{comment_id}/remove-upvote")
 async def remove_comment_upvote(request: Request, showcase_id: str, comment_id: str, token: Token = Depends(get_user_token)):
     await user_handler.remove_comment_upvote(comment_id=comment_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.put("/showcase/{showcase_id}/bookmark")
-async def bookmark_showcase(request: Request, showcase_id: str, token: Token = Depends(get_user_token)):
+async def bookmark_showcase(request: Request, showcase_id: uuid.UUID, token: Token = Depends(get_user_token)):
     await user_handler.bookmark_showcase(showcase_id=showcase_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.put("/showcase/{showcase_id}/un-bookmark")
-async def unbookmark_showcase(request: Request, showcase_id: str, token: Token = Depends(get_user_token)):
+async def unbookmark_showcase(request: Request, showcase_id: uuid.UUID, token: Token = Depends(get_user_token)):
     await user_handler.unbookmark_showcase(showcase_id=showcase_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
+
+@router.put("/showcases/like")
+async def like_showcases(request: Request, batch: ShowcaseBatch, token: Token = Depends(get_user_token)):
+    await user_handler.like_showcases(showcase_ids=batch.showcase_ids, user_id=token.sub)
+    return FastJSONResponse({"message": "success"})
+
+@router.put("/showcases/unlike")
+async def unlike_showcases(request: Request, batch: ShowcaseBatch, token: Token = Depends(get_user_token)):
+    await user_handler.unlike_showcases(showcase_ids=batch.showcase_ids, user_id=token.sub)
+    return FastJSONResponse({"message": "success"})
+
+@router.put("/showcases/bookmark")
+async def bookmark_showcases(request: Request, batch: ShowcaseBatch, token: Token = Depends(get_user_token)):
+    await user_handler.bookmark_showcases(showcase_ids=batch.showcase_ids, user_id=token.sub)
+    return FastJSONResponse({"message": "success"})
+
+@router.put("/showcases/un-bookmark")
+async def unbookmark_showcases(request: Request, batch: ShowcaseBatch, token: Token = Depends(get_user_token)):
+    await user_handler.unbookmark_showcases(showcase_ids=batch.showcase_ids, user_id=token.sub)
+    return FastJSONResponse({"message": "success"})
 
 # Vision Board APIs
 @router.get("/visionboards")
-async def get_visionboards(request: Request, token: Token = Depends(get_user_token)):
-    visionboards = await user_handler.get_visionboards(user_id=token.sub)
-    return JSONResponse({"message": "success", "visionboards": visionboards})
+async def get_visionboards(request: Request, cursor: Optional[str] = None, limit: int = PageLimit, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    return await page_response(
+        request, "visionboards",
+        lambda cursor, limit: user_handler.get_visionboards(user_id=token.sub, cursor=cursor, limit=limit, fields=fields),
+        cursor=cursor, limit=limit,
+    )
 
 @router.post("/visionboard/create")
 async def create_visionboard(request: Request, visionboard: VisionBoardModel, token: Token = Depends(get_user_token)):
     await user_handler.create_visionboard(visionboard=visionboard, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.put("/visionboard/{visionboard_id}/update")
 async def update_visionboard(request: Request, visionboard_id: str, visionboard: VisionBoardModel, token: Token = Depends(get_user_token)):
     await user_handler.update_visionboard(visionboard_id=visionboard_id, visionboard=visionboard, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.delete("/visionboard/{visionboard_id}/delete")
 async def delete_visionboard(request: Request, visionboard_id: str, token: Token = Depends(get_user_token)):
     await user_handler.delete_visionboard(visionboard_id=visionboard_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.patch("/visionboard/{visionboard_id}/assign-task/{user_id}")
 async def assign_visionboard_task(request: Request, visionboard_id: str, user_id: str, task: VisionBoardTaskModel, token: Token = Depends(get_user_token)):
     await user_handler.assign_visionboard_task(visionboard_id=visionboard_id, user_id=user_id, task=task, assigner_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 @router.post("/visionboard/{visionboard_id}/create-draft")
 async def create_visionboard_draft(request: Request, visionboard_id: str, token: Token = Depends(get_user_token)):
     await user_handler.create_visionboard_draft(visionboard_id=visionboard_id, user_id=token.sub)
-    return JSONResponse({"message": "success"})
+    return FastJSONResponse({"message": "success"})
 
 # Browse APIs Discover Page 
 @router.get("/browse/near-by-artist")
-async def get_nearby_artists(request: Request, token: Token = Depends(get_user_token)):
-    artists = await user_handler.get_nearby_artists(user_id=token.sub)
-    return JSONResponse({"message": "success", "artists": artists})
+async def get_nearby_artists(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = PageLimit,
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    genre: Optional[UserGenre] = None,
+    work_mode: Optional[WorkMode] = None,
+    payment_mode: Optional[PaymentMode] = None,
+    fields: Optional[List[str]] = Depends(field_list),
+    token: Token = Depends(get_user_token),
+):
+    return await page_response(
+        request, "artists",
+        lambda cursor, limit: user_handler.get_nearby_artists(
+            user_id=token.sub, cursor=cursor, limit=limit,
+            latitude=latitude, longitude=longitude, radius_km=radius_km,
+            genre=genre, work_mode=work_mode, payment_mode=payment_mode,
+            fields=fields,
+        ),
+        cursor=cursor, limit=limit,
+    )
 
 @router.get("/browse/top-rated")
-async def get_top_rated_artists(request: Request, token: Token = Depends(get_user_token)):
-    artists = await user_handler.get_top_rated_artists()
-    return JSONResponse({"message": "success", "artists": artists})
+async def get_top_rated_artists(request: Request, genre: Optional[UserGenre] = None, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    async def render():
+        artists = await user_handler.get_top_rated_artists(genre=genre, fields=fields)
+        return {"message": "success", "artists": artists}
+
+    # the board only changes when its version does
+    variant = (user_handler.leaderboard.version, tuple(sorted(set(fields or ()))))
+    return await conditional(request, ("top-rated", genre), variant, render, cache_control=SHORT_LIVED)
 
 @router.get("/browse/artist/{artist_id}/showcase")
-async def get_artist_showcases(request: Request, artist_id: str, token: Token = Depends(get_user_token)):
-    showcases = await user_handler.get_artist_showcases(artist_id=artist_id)
-    return JSONResponse({"message": "success", "showcases": showcases})
+async def get_artist_showcases(request: Request, artist_id: uuid.UUID, cursor: Optional[str] = None, limit: int = PageLimit, fields: Optional[List[str]] = Depends(field_list), token: Token = Depends(get_user_token)):
+    if wants_ndjson(request):
+        return await page_response(
+            request, "showcases",
+            lambda cursor, limit: user_handler.get_artist_showcases(artist_id=artist_id, cursor=cursor, limit=limit, fields=fields),
+            cursor=cursor, limit=limit,
+        )
+
+    async def render():
+        page = await user_handler.get_artist_showcases(artist_id=artist_id, cursor=cursor, limit=limit, fields=fields)
+        return {"message": "success", "showcases": page.items, "next_cursor": page.next_cursor}
+
+    variant = (cursor, limit, tuple(sorted(set(fields or ()))))
+    return await conditional(request, ("artist-showcases", str(artist_id)), variant, render)
 
 app.include_router(router)
 # updateing model
@@ -1,33 +1,185 @@
 from __future__ import annotations
 
+import asyncio
 import os
 from email.message import EmailMessage
+from typing import List, Optional, Set
 
-from aiosmtplib import send
+from aiosmtplib import SMTP, SMTPException, SMTPServerDisconnected
+
+from src.utils.log import log
 
 with open("static/otp-content.html", "r") as file:
     OTP_CONTENT = file.read()
 
+# split once so rendering a code is a concatenation rather than a format()
+OTP_HEAD, OTP_TAIL = OTP_CONTENT.split("{otp}", 1)
+
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_FROM = os.getenv("EMAIL_FROM", "Creatist <no-reply@creatist.site>")
+EMAIL_START_TLS = os.getenv("EMAIL_START_TLS", "true").lower() != "false"
 
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 2))
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", 1000))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", 3))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", 1.0))
+EMAIL_TIMEOUT = float(os.getenv("EMAIL_TIMEOUT", 30))
 
-async def send_otp_mail(email_address: str, otp: str) -> None:
+
+class EmailQueue:
+    """
+    A bounded queue of outgoing messages drained by a small pool of workers.
+    Each worker keeps its own authenticated SMTP connection open between
+    messages and reconnects when the server drops it. Failed sends are
+    retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        *,
+        hostname: Optional[str] = EMAIL_HOST,
+        port: int = EMAIL_PORT,
+        username: Optional[str] = EMAIL_ADDRESS,
+        password: Optional[str] = EMAIL_PASSWORD,
+        start_tls: bool = EMAIL_START_TLS,
+        workers: int = EMAIL_WORKERS,
+        maxsize: int = EMAIL_QUEUE_SIZE,
+        max_retries: int = EMAIL_MAX_RETRIES,
+        backoff: float = EMAIL_RETRY_BACKOFF,
+        timeout: float = EMAIL_TIMEOUT,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+
+    def start(self):
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def close(self, timeout: float = 10.0):
+        """
+        Waits up to ``timeout`` seconds for queued messages to go out, then
+        stops the workers.
+        """
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("Email queue closed with %d messages unsent", self.queue.qsize())
+
+        for task in [*self._tasks, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks = []
+        self._retries.clear()
+
+    def enqueue(self, message: EmailMessage) -> None:
+        """
+        Queues ``message`` for delivery, raising ``asyncio.QueueFull`` when
+        the queue is at capacity.
+        """
+        self.start()
+        self.queue.put_nowait((message, 0))
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def _connect(self) -> SMTP:
+        smtp = SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        return smtp
+
+    async def _worker(self):
+        smtp: Optional[SMTP] = None
+        try:
+            while True:
+                message, attempt = await self.queue.get()
+                try:
+                    if smtp is None or not smtp.is_connected:
+                        smtp = await self._connect()
+                    try:
+                        await smtp.send_message(message)
+                    except SMTPServerDisconnected:
+                        # idle connections get dropped, reconnect once for free
+                        smtp = await self._connect()
+                        await smtp.send_message(message)
+                    self.sent += 1
+                except (SMTPException, OSError, asyncio.TimeoutError):
+                    smtp = await self._discard(smtp)
+                    self._retry(message, attempt)
+                finally:
+                    self.queue.task_done()
+        finally:
+            await self._discard(smtp)
+
+    def _retry(self, message: EmailMessage, attempt: int):
+        if attempt >= self.max_retries:
+            self.failed += 1
+            log.error("Giving up on email to %s", message["To"], exc_info=True)
+            return
+
+        self.retried += 1
+        log.warning("Email to %s failed, retrying", message["To"], exc_info=True)
+
+        async def requeue():
+            await asyncio.sleep(self.backoff * 2**attempt)
+            await self.queue.put((message, attempt + 1))
+
+        task = asyncio.create_task(requeue())
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _discard(self, smtp: Optional[SMTP]) -> None:
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except (SMTPException, OSError, asyncio.TimeoutError):
+                smtp.close()
+        return None
+
+
+email_queue = EmailQueue()
+
+
+def render_otp_mail(email_address: str, otp: str) -> EmailMessage:
     message = EmailMessage()
     message["From"] = EMAIL_FROM
     message["To"] = email_address
     message["Subject"] = "Your Creatist OTP - Secure Access"
-    message.set_content(OTP_CONTENT.format(otp=otp), subtype="html")
-
-    await send(
-        message,
-        hostname=EMAIL_HOST,
-        port=EMAIL_PORT,
-        start_tls=True,
-        username=EMAIL_ADDRESS,
-        password=EMAIL_PASSWORD,
-    )
-    print("EMAIL SENT")
+    message.set_content(OTP_HEAD + otp + OTP_TAIL, subtype="html")
+    return message
+
+
+async def send_otp_mail(email_address: str, otp: str) -> None:
+    email_queue.enqueue(render_otp_mail(email_address, otp))
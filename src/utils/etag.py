@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import os
+from time import monotonic
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from src.utils.cache import TTLCache
+from src.utils.responses import FastJSONResponse
+
+ETAG_CACHE_SIZE = int(os.getenv("ETAG_CACHE_SIZE", 4096))
+ETAG_CACHE_TTL = float(os.getenv("ETAG_CACHE_TTL", 60))
+# variants remembered per resource, e.g. pages of one artist's showcases
+ETAG_CACHE_VARIANTS = int(os.getenv("ETAG_CACHE_VARIANTS", 32))
+
+# authenticated responses, so only the client may keep them
+REVALIDATE = "private, no-cache"
+SHORT_LIVED = "private, max-age=60"
+
+
+def etag_of(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+class ETagCache:
+    """
+    The ETag last served for each resource, kept for ``ttl`` seconds so a
+    revalidation that still matches is answered without reading or
+    serializing the resource again. Writes made through this process
+    invalidate a resource right away; writes made elsewhere are noticed once
+    the entry expires, the same staleness the user cache allows.
+    """
+
+    def __init__(self, maxsize: int = ETAG_CACHE_SIZE, ttl: float = ETAG_CACHE_TTL):
+        self.ttl = ttl
+        self._resources = TTLCache(maxsize=maxsize, ttl=ttl)
+        # resource -> a value from ``_counter`` set by its last invalidation,
+        # see ``set``; values are never reused, so an entry that expires and
+        # comes back can not match a generation read before
+        self._generations = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counter = itertools.count(1)
+
+    def generation(self, resource: Hashable) -> int:
+        return self._generations.get(resource, 0)
+
+    def get(self, resource: Hashable, variant: Hashable = ()) -> Optional[str]:
+        variants: Optional[Dict[Hashable, Tuple[float, str]]] = self._resources.get(resource)
+        entry = variants.get(variant) if variants else None
+        if entry is None or entry[0] <= monotonic():
+            return None
+        return entry[1]
+
+    def set(
+        self, resource: Hashable, variant: Hashable, etag: str, *, since: Optional[int] = None
+    ) -> None:
+        """
+        Remembers ``etag``. Pass the resource's ``generation`` read before
+        fetching the content as ``since``: if the resource was invalidated
+        meanwhile the content may predate a write, so it is not remembered.
+        """
+        if since is not None and since != self.generation(resource):
+            return
+        variants = self._resources.get(resource)
+        if variants is None:
+            variants = {}
+        variants.pop(variant, None)
+        variants[variant] = (monotonic() + self.ttl, etag)
+        while len(variants) > ETAG_CACHE_VARIANTS:
+            del variants[next(iter(variants))]
+        self._resources.set(resource, variants)
+
+    def invalidate(self, resource: Hashable) -> None:
+        self._generations.set(resource, next(self._counter))
+        self._resources.pop(resource)
+
+
+def conditional_response(
+    request: Request,
+    content: Any,
+    *,
+    cache_control: str,
+    etags: Optional[ETagCache] = None,
+    resource: Hashable = None,
+    variant: Hashable = (),
+    since: Optional[int] = None,
+) -> Response:
+    """
+    Renders ``content`` with a strong ETag computed from the body, or a 304
+    when the client already holds it. With ``etags`` the tag is remembered
+    for ``resource`` so the next revalidation can skip the work.
+    """
+    response = FastJSONResponse(content)
+    etag = etag_of(response.body)
+    if etags is not None:
+        etags.set(resource, variant, etag, since=since)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
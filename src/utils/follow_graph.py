@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple, Union
+from uuid import UUID
+
+from supabase import AsyncClient
+
+from src.utils.log import log
+
+FOLLOW_GRAPH_BATCH_SIZE = 1000
+# how often the graph is re-read, to pick up follows made by other workers
+FOLLOW_GRAPH_RELOAD_INTERVAL = float(os.getenv("FOLLOW_GRAPH_RELOAD_INTERVAL", 300))
+
+
+def _key(user_id: Union[UUID, str]) -> int:
+    if isinstance(user_id, str):
+        user_id = UUID(user_id)
+    return user_id.int
+
+
+class FollowGraph:
+    """
+    An in-memory adjacency index of the ``FollowerModel`` table.
+
+    Users are stored as the 128-bit integer of their UUID so each edge costs
+    one small int in two sets. The index is loaded at startup, kept current
+    by ``add`` and ``remove`` for follows made through this process, and
+    reloaded every ``FOLLOW_GRAPH_RELOAD_INTERVAL`` seconds for those made
+    through other workers.
+    """
+
+    def __init__(self):
+        self.followers: Dict[int, Set[int]] = defaultdict(set)
+        self.following: Dict[int, Set[int]] = defaultdict(set)
+        self.loaded = False
+        # add/remove calls made while a reload is reading, replayed onto it
+        self._changes: Optional[List[Tuple[bool, int, int]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self, supabase: AsyncClient, batch_size: int = FOLLOW_GRAPH_BATCH_SIZE):
+        # built aside and swapped in, so readers never see a partial graph
+        followers: Dict[int, Set[int]] = defaultdict(set)
+        following: Dict[int, Set[int]] = defaultdict(set)
+        self._changes = []
+        try:
+            offset = 0
+            while True:
+                response = await (
+                    supabase.table("FollowerModel")
+                    .select("user_id, following_id")
+                    .order("user_id")
+                    .order("following_id")
+                    .range(offset, offset + batch_size - 1)
+                    .execute()
+                )
+                for row in response.data:
+                    follower, followee = _key(row["user_id"]), _key(row["following_id"])
+                    following[follower].add(followee)
+                    followers[followee].add(follower)
+                if len(response.data) < batch_size:
+                    break
+                offset += batch_size
+        finally:
+            changes, self._changes = self._changes, None
+
+        self.followers, self.following = followers, following
+        for added, follower, followee in changes:
+            self._apply(added, follower, followee)
+        self.loaded = True
+
+    async def _run(self, supabase: AsyncClient, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load(supabase)
+            except Exception:
+                log.error("Follow graph reload failed", exc_info=True)
+
+    def start(self, supabase: AsyncClient, interval: float = FOLLOW_GRAPH_RELOAD_INTERVAL):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(supabase, interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def add(self, user_id: Union[UUID, str], following_id: Union[UUID, str]):
+        self._apply(True, _key(user_id), _key(following_id))
+
+    def remove(self, user_id: Union[UUID, str], following_id: Union[UUID, str]):
+        self._apply(False, _key(user_id), _key(following_id))
+
+    def _apply(self, added: bool, follower: int, followee: int):
+        if self._changes is not None:
+            self._changes.append((added, follower, followee))
+        if added:
+            self.following[follower].add(followee)
+            self.followers[followee].add(follower)
+        else:
+            self.following.get(follower, set()).discard(followee)
+            self.followers.get(followee, set()).discard(follower)
+
+    def follower_count(self, user_id: Union[UUID, str]) -> int:
+        return len(self.followers.get(_key(user_id), ()))
+
+    def following_count(self, user_id: Union[UUID, str]) -> int:
+        return len(self.following.get(_key(user_id), ()))
+
+    def is_following(self, user_id: Union[UUID, str], following_id: Union[UUID, str]) -> bool:
+        return _key(following_id) in self.following.get(_key(user_id), ())
+
+    def mutuals(self, user_id: Union[UUID, str], limit: int) -> List[UUID]:
+        """
+        Users that ``user_id`` follows and who follow them back.
+        """
+        key = _key(user_id)
+        return self._intersect(
+            self.following.get(key, set()), self.followers.get(key, set()), limit
+        )
+
+    def followed_by_following(
+        self, viewer_id: Union[UUID, str], user_id: Union[UUID, str], limit: int
+    ) -> List[UUID]:
+        """
+        Users that ``viewer_id`` follows who also follow ``user_id``.
+        """
+        return self._intersect(
+            self.following.get(_key(viewer_id), set()),
+            self.followers.get(_key(user_id), set()),
+            limit,
+        )
+
+    def _intersect(self, a: Set[int], b: Set[int], limit: int) -> List[UUID]:
+        if len(a) > len(b):
+            a, b = b, a
+        result = []
+        for key in a:
+            if key in b:
+                result.append(UUID(int=key))
+                if len(result) >= limit:
+                    break
+        return result
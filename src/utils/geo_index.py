@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import math
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+from uuid import UUID
+
+from supabase import AsyncClient
+
+from src.utils.log import log
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+GEO_CELL_SIZE = float(os.getenv("GEO_CELL_SIZE", 0.1))  # degrees, ~11km of latitude
+GEO_INDEX_BATCH_SIZE = 1000
+GEO_COLUMNS = "id, latitude, longitude, genres, work_mode, payment_mode"
+# how often locations are re-read, to pick up users updated by other workers
+GEO_INDEX_RELOAD_INTERVAL = float(os.getenv("GEO_INDEX_RELOAD_INTERVAL", 300))
+
+
+class GeoEntry(NamedTuple):
+    key: int
+    latitude: float
+    longitude: float
+    genres: Optional[str]
+    work_mode: Optional[str]
+    payment_mode: Optional[str]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """
+    A uniform latitude/longitude grid of user locations.
+
+    Each user lives in exactly one cell. Nearest-neighbour queries scan rings
+    of cells outward from the query point and stop as soon as no unvisited
+    cell can hold a closer match, so the work depends on local density
+    rather than on the total number of users.
+
+    The grid is loaded at startup, kept current by ``upsert`` and ``remove``
+    for users changed through this process, and reloaded every
+    ``GEO_INDEX_RELOAD_INTERVAL`` seconds for those changed through other
+    workers.
+    """
+
+    def __init__(self, cell_size: float = GEO_CELL_SIZE):
+        self.cell_size = cell_size
+        self.lat_cells = int(math.ceil(180 / cell_size))
+        self.lon_cells = int(math.ceil(360 / cell_size))
+
+        self.entries: Dict[int, GeoEntry] = {}
+        self.cells: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+        # upsert/remove calls made while a reload is reading, replayed onto it
+        self._changes: Optional[List[Tuple[Optional[dict], int]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        i = min(int((latitude + 90) / self.cell_size), self.lat_cells - 1)
+        j = int((longitude + 180) / self.cell_size) % self.lon_cells
+        return i, j
+
+    async def load(self, supabase: AsyncClient, batch_size: int = GEO_INDEX_BATCH_SIZE):
+        # built aside and swapped in, so readers never see a partial grid
+        entries: Dict[int, GeoEntry] = {}
+        cells: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+        self._changes = []
+        try:
+            offset = 0
+            while True:
+                response = await (
+                    supabase.table("users")
+                    .select(GEO_COLUMNS)
+                    .not_.is_("latitude", "null")
+                    .not_.is_("longitude", "null")
+                    .order("id")
+                    .range(offset, offset + batch_size - 1)
+                    .execute()
+                )
+                for row in response.data:
+                    self._place(entries, cells, UUID(str(row["id"])).int, row)
+                if len(response.data) < batch_size:
+                    break
+                offset += batch_size
+        finally:
+            changes, self._changes = self._changes, None
+
+        self.entries, self.cells = entries, cells
+        for row, key in changes:
+            self._place(self.entries, self.cells, key, row)
+
+    async def _run(self, supabase: AsyncClient, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load(supabase)
+            except Exception:
+                log.error("Geo index reload failed", exc_info=True)
+
+    def start(self, supabase: AsyncClient, interval: float = GEO_INDEX_RELOAD_INTERVAL):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(supabase, interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def upsert(self, row: dict):
+        key = UUID(str(row["id"])).int
+        if self._changes is not None:
+            self._changes.append((row, key))
+        self._place(self.entries, self.cells, key, row)
+
+    def remove(self, user_id: Union[UUID, str, int]):
+        key = user_id if isinstance(user_id, int) else UUID(str(user_id)).int
+        if self._changes is not None:
+            self._changes.append((None, key))
+        self._place(self.entries, self.cells, key, None)
+
+    def _place(
+        self,
+        entries: Dict[int, GeoEntry],
+        cells: Dict[Tuple[int, int], Set[int]],
+        key: int,
+        row: Optional[dict],
+    ):
+        # moves ``key`` to the location in ``row``, or out of the grid
+        entry = entries.pop(key, None)
+        if entry is not None:
+            cell = self._cell(entry.latitude, entry.longitude)
+            cells[cell].discard(key)
+            if not cells[cell]:
+                del cells[cell]
+
+        if row is None:
+            return
+        latitude, longitude = row.get("latitude"), row.get("longitude")
+        if latitude is None or longitude is None:
+            return
+
+        entry = GeoEntry(
+            key=key,
+            latitude=float(latitude),
+            longitude=float(longitude),
+            genres=row.get("genres"),
+            work_mode=row.get("work_mode"),
+            payment_mode=row.get("payment_mode"),
+        )
+        entries[key] = entry
+        cells[self._cell(entry.latitude, entry.longitude)].add(key)
+
+    def _ring(self, center: Tuple[int, int], radius: int):
+        ci, cj = center
+        seen = set()
+        for di in range(-radius, radius + 1):
+            i = ci + di
+            if i < 0 or i >= self.lat_cells:
+                continue
+            edge = abs(di) == radius
+            for dj in range(-radius, radius + 1) if edge else (-radius, radius):
+                cell = (i, (cj + dj) % self.lon_cells)
+                if cell not in seen:
+                    seen.add(cell)
+                    yield cell
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        *,
+        radius_km: Optional[float] = None,
+        after: Optional[Tuple[float, int]] = None,
+        predicate: Optional[Callable[[GeoEntry], bool]] = None,
+    ) -> List[Tuple[float, UUID]]:
+        """
+        Returns up to ``k`` ``(distance_km, user_id)`` pairs ordered by
+        ``(distance, id)``, optionally bounded by ``radius_km`` and starting
+        strictly after the ``after`` key of a previous page.
+        """
+        center = self._cell(latitude, longitude)
+
+        def ring_km(radius: int) -> float:
+            # the narrowest cell width within ``radius`` rings bounds how close
+            # anything beyond them can be
+            edge = min(abs(latitude) + (radius + 1) * self.cell_size, 89.9)
+            return self.cell_size * KM_PER_DEGREE * math.cos(math.radians(edge))
+
+        max_rings = max(self.lat_cells, self.lon_cells)
+        if radius_km is not None:
+            reach = int(radius_km / KM_PER_DEGREE / self.cell_size) + 1
+            max_rings = min(max_rings, int(radius_km / ring_km(reach)) + 1)
+
+        def matches(keys):
+            for key in keys:
+                entry = self.entries[key]
+                distance = haversine_km(
+                    latitude, longitude, entry.latitude, entry.longitude
+                )
+                if radius_km is not None and distance > radius_km:
+                    continue
+                if after is not None and (distance, key) <= after:
+                    continue
+                if predicate is not None and not predicate(entry):
+                    continue
+                yield distance, key
+
+        found: List[Tuple[float, int]] = []
+        for radius in range(max_rings + 1):
+            if (2 * radius + 1) ** 2 > len(self.entries):
+                # sparser than the grid itself: a linear scan is cheaper
+                found = list(matches(self.entries))
+                break
+
+            for cell in self._ring(center, radius):
+                found.extend(matches(self.cells.get(cell, ())))
+
+            if len(found) >= k:
+                found = heapq.nsmallest(k, found)
+                if found[-1][0] <= radius * ring_km(radius):
+                    break
+
+        return [(distance, UUID(int=key)) for distance, key in heapq.nsmallest(k, found)]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import datetime, timezone
+from time import monotonic, perf_counter
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.utils.log import log
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", 5))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))
+
+
+class Probe:
+    def __init__(self, name: str, check: Callable[[], Awaitable[None]], critical: bool):
+        self.name = name
+        self.check = check
+        self.critical = critical
+
+        self.ok: Optional[bool] = None
+        self.latency: Optional[float] = None
+        self.checked_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[datetime] = None
+
+    async def run(self, timeout: float) -> None:
+        ini = perf_counter()
+        try:
+            await asyncio.wait_for(self.check(), timeout)
+            self.ok = True
+        except Exception as exc:
+            self.ok = False
+            self.last_error = (
+                f"timed out after {timeout}s" if isinstance(exc, asyncio.TimeoutError)
+                else f"{type(exc).__name__}: {exc}"
+            )
+            self.last_error_at = datetime.now(timezone.utc)
+            log.warning("Health probe %s failed: %s", self.name, self.last_error)
+        self.latency = perf_counter() - ini
+        self.checked_at = datetime.now(timezone.utc)
+
+    def report(self) -> dict:
+        return {
+            "ok": self.ok,
+            "critical": self.critical,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at.isoformat() if self.last_error_at else None,
+        }
+
+
+class HealthCheck:
+    """
+    Dependency probes shared by every readiness request. Probes run together,
+    each bounded by ``timeout``, and their results are reused for
+    ``interval`` seconds, so however often the load balancer asks, the
+    dependencies see at most one probe per interval per worker.
+    """
+
+    def __init__(
+        self,
+        interval: float = HEALTH_CHECK_INTERVAL,
+        timeout: float = HEALTH_CHECK_TIMEOUT,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.probes: Dict[str, Probe] = {}
+
+        self._checked_at: Optional[float] = None
+        self._running: Optional[asyncio.Task] = None
+
+    def add(self, name: str, check: Callable[[], Awaitable[None]], *, critical: bool = True):
+        """
+        Registers ``check``, a coroutine function that raises when the
+        dependency is unreachable. A failing non-critical probe is reported
+        but does not make the service unready.
+        """
+        self.probes[name] = Probe(name, check, critical)
+
+    async def _run(self) -> None:
+        await asyncio.gather(*(probe.run(self.timeout) for probe in self.probes.values()))
+        self._checked_at = monotonic()
+
+    async def refresh(self) -> None:
+        stale = self._checked_at is None or monotonic() - self._checked_at >= self.interval
+        if not stale:
+            return
+        # concurrent callers wait on the same round of probes
+        if self._running is None or self._running.done():
+            self._running = asyncio.create_task(self._run())
+        await asyncio.shield(self._running)
+
+    @property
+    def ready(self) -> bool:
+        return all(probe.ok for probe in self.probes.values() if probe.critical)
+
+    async def status(self) -> dict:
+        await self.refresh()
+        return {
+            "ready": self.ready,
+            "checks": {name: probe.report() for name, probe in self.probes.items()},
+        }
+
+
+health = HealthCheck()
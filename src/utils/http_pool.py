@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+from time import perf_counter
+from typing import AsyncIterator, Callable, Optional
+
+import httpx
+
+from src.utils.log import log
+from src.utils.metrics import supabase_duration, supabase_requests
+
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", 50))
+SUPABASE_POOL_KEEPALIVE = int(os.getenv("SUPABASE_POOL_KEEPALIVE", 20))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", 30))
+SUPABASE_HTTP2 = (
+    os.getenv("SUPABASE_HTTP2", "true").lower() != "false"
+    and importlib.util.find_spec("h2") is not None
+)
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", 5))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", 10))
+SUPABASE_WRITE_TIMEOUT = float(os.getenv("SUPABASE_WRITE_TIMEOUT", 10))
+SUPABASE_POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", 5))
+SUPABASE_WARM_CONNECTIONS = int(os.getenv("SUPABASE_WARM_CONNECTIONS", 4))
+
+OPERATIONS = {
+    "GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete",
+}
+
+
+def _describe(request: httpx.Request) -> tuple:
+    # (table, operation) labels for a PostgREST request
+    path = request.url.path
+    _, rest, table = path.partition("/rest/v1/")
+    if not rest:
+        table = path.strip("/").split("/", 1)[0]
+    operation = OPERATIONS.get(request.method, request.method.lower())
+    if operation == "insert" and "resolution=" in request.headers.get("prefer", ""):
+        operation = "upsert"
+    return table or "root", operation
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    # the pool slot is held until the body has been read and closed
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+            self._release = lambda: None
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """
+    An ``httpx`` transport that admits at most ``size`` requests at once and
+    records how busy it is. Requests beyond ``size`` wait for a slot for up to
+    ``pool_timeout`` seconds before ``httpx.PoolTimeout`` is raised; the time
+    spent waiting is what shows the pool is saturated.
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int = SUPABASE_POOL_SIZE,
+        keepalive: int = SUPABASE_POOL_KEEPALIVE,
+        keepalive_expiry: float = SUPABASE_KEEPALIVE_EXPIRY,
+        http2: bool = SUPABASE_HTTP2,
+        pool_timeout: float = SUPABASE_POOL_TIMEOUT,
+    ):
+        self.size = size
+        self.http2 = http2
+        self.pool_timeout = pool_timeout
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=size,
+                max_keepalive_connections=keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(size)
+
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waiting = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def utilization(self) -> float:
+        return self.in_use / self.size
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "http2": self.http2,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "waiting": self.waiting,
+            "utilization": self.utilization,
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "wait_avg": self.wait_total / self.requests if self.requests else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+    async def _acquire(self) -> float:
+        ini = perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.pool_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise httpx.PoolTimeout("Timed out waiting for a Supabase connection")
+        finally:
+            self.waiting -= 1
+
+        waited = perf_counter() - ini
+        self.requests += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return waited
+
+    def _release(self) -> None:
+        self.in_use -= 1
+        self._semaphore.release()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        table, operation = _describe(request)
+        ini = perf_counter()
+        await self._acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            supabase_duration.observe(perf_counter() - ini, table, operation)
+            supabase_requests.inc(table, operation, "error")
+            raise
+
+        status = str(response.status_code)
+
+        def done():
+            self._release()
+            supabase_duration.observe(perf_counter() - ini, table, operation)
+            supabase_requests.inc(table, operation, status)
+
+        response.stream = _ReleasingStream(response.stream, done)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_http_client(transport: Optional[PooledTransport] = None) -> httpx.AsyncClient:
+    """
+    The HTTP client shared by every Supabase sub-client.
+    """
+    return httpx.AsyncClient(
+        transport=transport or PooledTransport(),
+        timeout=httpx.Timeout(
+            connect=SUPABASE_CONNECT_TIMEOUT,
+            read=SUPABASE_READ_TIMEOUT,
+            write=SUPABASE_WRITE_TIMEOUT,
+            pool=SUPABASE_POOL_TIMEOUT,
+        ),
+        follow_redirects=True,
+    )
+
+
+async def warm_pool(
+    client: httpx.AsyncClient,
+    url: str,
+    key: str,
+    connections: int = SUPABASE_WARM_CONNECTIONS,
+    http2: bool = SUPABASE_HTTP2,
+) -> None:
+    """
+    Opens ``connections`` connections to the REST endpoint ahead of the first
+    user request so TLS handshakes are not paid on the request path. Over
+    HTTP/2 a single connection is shared, so one request is enough.
+    """
+    if http2:
+        connections = min(connections, 1)
+
+    async def touch():
+        response = await client.head(url.rstrip("/") + "/rest/v1/", headers={"apikey": key})
+        await response.aclose()
+
+    results = await asyncio.gather(
+        *(touch() for _ in range(connections)), return_exceptions=True
+    )
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        log.warning("Warmed %d of %d Supabase connections: %r",
+                    connections - len(failures), connections, failures[0])
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from time import monotonic
+from typing import Dict, List, Optional
+
+from supabase import AsyncClient
+
+from src.models import UserGenre, UserModel
+from src.utils.log import log
+
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 10))
+LEADERBOARD_MAX_STALENESS = float(os.getenv("LEADERBOARD_MAX_STALENESS", 300))
+
+
+class Leaderboard:
+    """
+    Top rated users overall and per ``UserGenre``.
+
+    Boards are rebuilt from the database in the background every half of
+    ``max_staleness`` seconds and patched in place when a rating changes, so
+    reads are a dictionary lookup.
+    """
+
+    def __init__(
+        self,
+        size: int = LEADERBOARD_SIZE,
+        max_staleness: float = LEADERBOARD_MAX_STALENESS,
+    ):
+        self.size = size
+        self.max_staleness = max_staleness
+
+        self.boards: Dict[Optional[UserGenre], List[UserModel]] = {}
+        self.refreshed_at: Optional[float] = None
+        self.version = 0
+
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _fetch(self, supabase: AsyncClient, genre: Optional[UserGenre]) -> List[UserModel]:
+        query = supabase.table("users").select("*").not_.is_("rating", "null")
+        if genre is not None:
+            query = query.eq("genres", genre.value)
+        response = await (
+            query.order("rating", desc=True).order("id").limit(self.size).execute()
+        )
+        return [UserModel(**user) for user in response.data]
+
+    async def refresh(self, supabase: AsyncClient, *, only_if_stale: bool = False):
+        async with self._lock:
+            # readers queued behind a refresh find the boards fresh again
+            if only_if_stale and not self.stale:
+                return
+            genres: List[Optional[UserGenre]] = [None, *UserGenre]
+            results = await asyncio.gather(
+                *(self._fetch(supabase, genre) for genre in genres)
+            )
+            self.boards = dict(zip(genres, results))
+            self.refreshed_at = monotonic()
+            self.version += 1
+
+    async def _run(self, supabase: AsyncClient):
+        while True:
+            await asyncio.sleep(self.max_staleness / 2)
+            try:
+                await self.refresh(supabase)
+            except Exception:
+                log.error("Leaderboard refresh failed", exc_info=True)
+
+    def start(self, supabase: AsyncClient):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(supabase))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def stale(self) -> bool:
+        return (
+            self.refreshed_at is None
+            or monotonic() - self.refreshed_at > self.max_staleness
+        )
+
+    async def top(self, supabase: AsyncClient, genre: Optional[UserGenre] = None) -> List[UserModel]:
+        if self.stale:
+            await self.refresh(supabase, only_if_stale=True)
+        return self.boards.get(genre, [])
+
+    def update(self, user: UserModel):
+        """
+        Moves ``user`` to their current position on the global and genre
+        boards. A user whose rating drops keeps their place until the next
+        refresh even if someone off the board now outranks them.
+        """
+        changed = False
+        for genre, board in self.boards.items():
+            kept = [entry for entry in board if entry.id != user.id]
+            eligible = user.rating is not None and genre in (None, user.genres)
+            if eligible:
+                kept.append(user)
+                kept.sort(key=lambda entry: (-entry.rating, str(entry.id)))
+                kept = kept[: self.size]
+            if kept != board:
+                self.boards[genre] = kept
+                changed = True
+
+        if changed:
+            self.version += 1
@@ -1,15 +1,68 @@
 from __future__ import annotations
 
+import atexit
 import logging
 import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
 from collections import deque, namedtuple
 from datetime import datetime
-from typing import Iterable
+from typing import Iterable, List
 
 from pytz import timezone
 
+UTC = timezone("UTC")
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 256))
+LOG_SAMPLE_RATES = {
+    logging.DEBUG: float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1.0)),
+    logging.INFO: float(os.getenv("LOG_INFO_SAMPLE_RATE", 1.0)),
+}
+
+LOG_FILE = os.getenv("LOG_FILE", "logs/log.log")
+
+# held open, and so locked, for as long as this process runs
+_slot_lock = None
+
+
+def _worker_slot(root: str) -> str:
+    """
+    The lowest worker number whose ``<root>.<n>.lock`` no live process
+    holds, claimed for the life of this one. Restarted workers take over
+    the numbers, and so the log files, of those they replace.
+    """
+    global _slot_lock
+    try:
+        import fcntl
+    except ImportError:  # Windows: the pid, files are not reused
+        return str(os.getpid())
+
+    slot = 0
+    while True:
+        file = open(f"{root}.{slot}.lock", "a")
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            slot += 1
+            continue
+        # released when the process exits, however it exits
+        _slot_lock = file
+        return str(slot)
+
+
+if os.getenv("LOG_FILE_PER_WORKER", "false").lower() == "true":
+    # a rotating file can only be rolled over by the one process writing it
+    _root, _ext = os.path.splitext(LOG_FILE)
+    LOG_FILE = f"{_root}.{_worker_slot(_root)}{_ext}"
+
 filehandler = logging.handlers.RotatingFileHandler(
-    "logs/log.log",
+    LOG_FILE,
     maxBytes=1024 * 1024 * 5,
     mode="a",
 )
@@ -19,6 +72,148 @@ formatter = logging.Formatter(
 )
 filehandler.setFormatter(formatter)
 
+_STOP = object()
+
+
+class BackgroundWriter(logging.Handler):
+    """
+    Hands log entries to a daemon thread which builds, formats and writes them
+    to the target file handler in batches, so the caller never touches the
+    disk. Entries arriving while the queue is full, or that fail to build or
+    format, are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        target: logging.handlers.RotatingFileHandler,
+        maxsize: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+    ):
+        super().__init__(level=target.level)
+        self.target = target
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.dropped = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name="log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, entry) -> None:
+        """
+        Enqueues either a ``LogRecord`` or a ``(created, logger, level, func,
+        args, exc_info)`` tuple whose record is built on the writer thread.
+        """
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            return
+        self.queue.put(entry)
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        self.submit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.submit(record)
+
+    def flush(self) -> None:
+        if self._thread.is_alive():
+            done = threading.Event()
+            self.queue.put(done)
+            done.wait()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        self.target.close()
+        super().close()
+
+    def _run(self) -> None:
+        while True:
+            batch: List[logging.LogRecord] = []
+            events: List[threading.Event] = []
+            entry = self.queue.get()
+            while True:
+                if entry is _STOP:
+                    break
+                if isinstance(entry, threading.Event):
+                    events.append(entry)
+                else:
+                    try:
+                        batch.append(self._to_record(entry))
+                    except Exception:
+                        self.dropped += 1
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    entry = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                if batch:
+                    self._write(batch)
+            except Exception:
+                self.dropped += len(batch)
+            finally:
+                for event in events:
+                    event.set()
+            if entry is _STOP:
+                return
+
+    def _to_record(self, entry) -> logging.LogRecord:
+        if isinstance(entry, logging.LogRecord):
+            return entry
+
+        created, logger, level, func, args, exc_info = entry
+        record = logger.makeRecord(
+            logger.name,
+            level,
+            "(unknown file)",
+            0,
+            args[0] if args else "",
+            args[1:],
+            exc_info,
+            func,
+        )
+        record.created = created
+        record.msecs = int((created - int(created)) * 1000) + 0.0
+        return record
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.target.format(record) + self.target.terminator)
+            except Exception:
+                # e.g. arguments that do not match the message's % format
+                self.dropped += 1
+        if not lines:
+            return
+
+        target = self.target
+        target.acquire()
+        try:
+            chunk = "".join(lines)
+            if target.stream is None:
+                target.stream = target._open()
+            position = target.stream.tell()
+            if target.maxBytes and position and position + len(chunk) >= target.maxBytes:
+                target.doRollover()
+            target.stream.write(chunk)
+            target.stream.flush()
+        except Exception:
+            target.handleError(batch[-1])
+        finally:
+            target.release()
+
+
+writer = BackgroundWriter(filehandler)
+atexit.register(writer.close)
+
 
 class Record(namedtuple("Record", ["time", "name", "levelname", "msg"])):
     """
@@ -36,40 +231,54 @@ class CustomLogger:
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logging.DEBUG)
-        self.logger.addHandler(filehandler)
+        if writer not in self.logger.handlers:
+            self.logger.addHandler(writer)
 
         self._recent_logs = deque(maxlen=1024)
+        self.sampled = 0
+
+    def _log(self, level: int, levelname: str, args: tuple, kwargs: dict):
+        if not self.logger.isEnabledFor(level):
+            return
+
+        rate = LOG_SAMPLE_RATES.get(level)
+        if rate is not None and rate < 1.0 and random.random() >= rate:
+            self.sampled += 1
+            return
+
+        exc_info = kwargs.get("exc_info")
+        if isinstance(exc_info, BaseException):
+            exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+        elif exc_info and not isinstance(exc_info, tuple):
+            exc_info = sys.exc_info()
+
+        created = time.time()
+        # frame 2 is whoever called debug()/info()/...
+        func = sys._getframe(2).f_code.co_name
+        writer.submit((created, self.logger, level, func, args, exc_info or None))
+        self._recent_logs.append((created, levelname, args, kwargs))
 
     def debug(self, *args, **kwargs):
-        self.logger.debug(*args, **kwargs)
-        self._recent_logs.append((datetime.now(timezone("UTC")), "debug", args, kwargs))
+        self._log(logging.DEBUG, "debug", args, kwargs)
 
     def info(self, *args, **kwargs):
-        self.logger.info(*args, **kwargs)
-        self._recent_logs.append((datetime.now(timezone("UTC")), "info", args, kwargs))
+        self._log(logging.INFO, "info", args, kwargs)
 
     def warning(self, *args, **kwargs):
-        self.logger.warning(*args, **kwargs)
-        self._recent_logs.append(
-            (datetime.now(timezone("UTC")), "warning", args, kwargs)
-        )
+        self._log(logging.WARNING, "warning", args, kwargs)
 
     def error(self, *args, **kwargs):
-        self.logger.error(*args, **kwargs)
-        self._recent_logs.append((datetime.now(timezone("UTC")), "error", args, kwargs))
+        self._log(logging.ERROR, "error", args, kwargs)
 
     def critical(self, *args, **kwargs):
-        self.logger.critical(*args, **kwargs)
-        self._recent_logs.append(
-            (datetime.now(timezone("UTC")), "critical", args, kwargs)
-        )
+        self._log(logging.CRITICAL, "critical", args, kwargs)
 
     @property
     def recent_logs(self) -> Iterable[Record]:
         """
         Returns the most recent logs.
         """
-        for time, level, args, kwargs in self._recent_logs:
+        for timestamp, level, args, kwargs in self._recent_logs:
             formatted_message = self.logger.makeRecord(
                 self.logger.name,
                 getattr(logging, level.upper()),
@@ -80,7 +289,7 @@ class CustomLogger:
                 exc_info=kwargs.get("exc_info", None),
             )
             yield Record(
-                time=time,
+                time=datetime.fromtimestamp(timestamp, UTC),
                 name=formatted_message.name,
                 levelname=formatted_message.levelname,
                 msg=formatted_message.getMessage(),
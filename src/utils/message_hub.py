@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Set, Union
+from uuid import UUID
+
+import anyio
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+
+from src.utils.log import log
+from src.utils.responses import dump_json
+
+MESSAGE_BROKER = os.getenv("MESSAGE_BROKER", "memory")
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 64))
+
+# close code for a client that could not keep up, it should reconnect and
+# catch up over REST
+SLOW_CONSUMER = 1013
+
+
+class Broker(ABC):
+    """
+    Carries published events to every worker's hub. Implementations shared
+    between workers let a message sent through one process reach sockets
+    held by another.
+    """
+
+    @abstractmethod
+    async def start(self, deliver: Callable[[str, bytes], None]) -> None:
+        """
+        Starts calling ``deliver(channel, data)`` for every event published
+        by any worker, this one included.
+        """
+
+    @abstractmethod
+    async def publish(self, channel: str, data: bytes) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+class LocalBroker(Broker):
+    """
+    Delivers events straight to this process's hub. Suitable for a single
+    worker and for tests.
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[str, bytes], None]] = None
+
+    async def start(self, deliver: Callable[[str, bytes], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, channel: str, data: bytes) -> None:
+        if self._deliver is not None:
+            self._deliver(channel, data)
+
+    async def close(self) -> None:
+        self._deliver = None
+
+
+def get_broker(spec: str = MESSAGE_BROKER) -> Broker:
+    """
+    Builds the broker named by ``MESSAGE_BROKER``. Only ``memory`` ships
+    with the app.
+    """
+    if spec != "memory":
+        raise ValueError(f"Unknown MESSAGE_BROKER {spec!r}")
+    return LocalBroker()
+
+
+class Connection:
+    def __init__(self, websocket: WebSocket, maxsize: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.scope: Optional[anyio.CancelScope] = None
+        self.overflowed = False
+
+    async def drain(self) -> None:
+        try:
+            while True:
+                data = await self.queue.get()
+                await self.websocket.send({"type": "websocket.send", "text": data.decode()})
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            # the client went away mid-send
+            pass
+
+    async def receive(self) -> None:
+        # anything the client sends is ignored, so it can be used as a keepalive
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+
+class MessageHub:
+    """
+    Fans events out to every open socket of a user. Each socket has its own
+    bounded send queue written by a dedicated task, so one slow client never
+    holds up delivery to the others. A client whose queue fills up is
+    disconnected rather than buffered without limit.
+    """
+
+    def __init__(self, broker: Optional[Broker] = None, queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.broker = broker or get_broker()
+        self.queue_size = queue_size
+        self.connections: Dict[str, Set[Connection]] = defaultdict(set)
+
+        self.delivered = 0
+        self.evicted = 0
+
+    async def start(self) -> None:
+        await self.broker.start(self._deliver)
+
+    async def close(self) -> None:
+        await self.broker.close()
+        for connections in list(self.connections.values()):
+            for connection in list(connections):
+                if connection.scope is not None:
+                    connection.scope.cancel()
+
+    async def publish(self, user_id: Union[UUID, str], event: dict) -> None:
+        # serialized once, however many sockets it reaches
+        await self.broker.publish(str(user_id), dump_json(event))
+
+    def _deliver(self, channel: str, data: bytes) -> None:
+        for connection in list(self.connections.get(channel, ())):
+            try:
+                connection.queue.put_nowait(data)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                if not connection.overflowed:
+                    connection.overflowed = True
+                    self.evicted += 1
+                    connection.scope.cancel()
+
+    @property
+    def open(self) -> int:
+        return sum(map(len, self.connections.values()))
+
+    async def serve(self, user_id: Union[UUID, str], websocket: WebSocket) -> None:
+        """
+        Relays ``user_id``'s events to an accepted ``websocket`` until either
+        side goes away or the hub drops it.
+        """
+        channel = str(user_id)
+        connection = Connection(websocket, self.queue_size)
+        self.connections[channel].add(connection)
+        try:
+            async with anyio.create_task_group() as tasks:
+                connection.scope = tasks.cancel_scope
+
+                async def until_done(func):
+                    await func()
+                    tasks.cancel_scope.cancel()
+
+                tasks.start_soon(until_done, connection.drain)
+                tasks.start_soon(until_done, connection.receive)
+        finally:
+            self.connections[channel].discard(connection)
+            if not self.connections[channel]:
+                del self.connections[channel]
+
+        if WebSocketState.DISCONNECTED not in (websocket.client_state, websocket.application_state):
+            code, reason = 1001, "going away"
+            if connection.overflowed:
+                log.warning("Closing slow message socket for %s", channel)
+                code, reason = SLOW_CONSUMER, "send queue full"
+            try:
+                await websocket.close(code=code, reason=reason)
+            except (RuntimeError, OSError):
+                pass
+
+
+message_hub = MessageHub()
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from starlette.routing import Mount
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(label for label in extra if label)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self, extra: str = "") -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.labels, labels, extra)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets. Counts are stored per bucket and
+    only made cumulative when rendered, so ``observe`` is a bisect and two
+    additions.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, extra: str = "") -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, extra, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels, extra)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels, extra)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    A value read from ``read`` at scrape time, so nothing is recorded on the
+    request path.
+    """
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self, extra: str = "") -> List[str]:
+        try:
+            value = float(self.read())
+        except Exception:
+            return []
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name}{_labels((), (), extra)} {value}",
+        ]
+
+
+class Registry:
+    """
+    The metrics of this process. Every worker keeps its own, so each series
+    is rendered with a ``worker`` label holding the process id and a scrape
+    shows only the worker that answered it; sum over ``worker`` to combine
+    them.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, documentation, read))
+
+    def render(self) -> str:
+        worker = 'worker="%d"' % os.getpid()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render(worker))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time spent handling a request.", ("method", "route")
+)
+http_requests = registry.counter(
+    "http_requests_total", "Requests handled, by status code.", ("method", "route", "status")
+)
+handler_duration = registry.histogram(
+    "user_handler_duration_seconds", "Time spent in UserHandler methods.", ("method",)
+)
+handler_errors = registry.counter(
+    "user_handler_errors_total", "UserHandler calls that raised.", ("method",)
+)
+supabase_duration = registry.histogram(
+    "supabase_request_duration_seconds",
+    "Supabase round trips including reading the response body.",
+    ("table", "operation"),
+)
+supabase_requests = registry.counter(
+    "supabase_requests_total", "Supabase round trips, by status code.",
+    ("table", "operation", "status"),
+)
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    endpoint = scope.get("endpoint")
+    if route is None and endpoint is not None:
+        # plain starlette routes only set the endpoint
+        route = next(
+            (
+                candidate
+                for candidate in getattr(scope.get("app"), "routes", ())
+                # a mount is labelled by its prefix, whatever path it served
+                if getattr(candidate, "endpoint", None) is endpoint
+                or (isinstance(candidate, Mount) and candidate.app is endpoint)
+            ),
+            None,
+        )
+    return route.path if route is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records latency and status for every HTTP request, labelled by the route
+    template (``/v1/showcase/{showcase_id}``) rather than the raw path so
+    the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        ini = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = _route_path(scope)
+            method = scope["method"]
+            http_request_duration.observe(perf_counter() - ini, method, path)
+            http_requests.inc(method, path, status)
+
+
+def instrument(cls):
+    """
+    Class decorator timing every public method of ``cls`` into
+    ``user_handler_duration_seconds``.
+    """
+
+    def wrap(name, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed(*args, **kwargs):
+                ini = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    handler_errors.inc(name)
+                    raise
+                finally:
+                    handler_duration.observe(perf_counter() - ini, name)
+        else:
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                ini = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except BaseException:
+                    handler_errors.inc(name)
+                    raise
+                finally:
+                    handler_duration.observe(perf_counter() - ini, name)
+        return timed
+
+    for name, func in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(func):
+            setattr(cls, name, wrap(name, func))
+    return cls
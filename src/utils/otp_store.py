@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import hmac
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+OTP_TTL = float(os.getenv("OTP_TTL", 300))
+OTP_STORE_SIZE = int(os.getenv("OTP_STORE_SIZE", 100000))
+OTP_STORE = os.getenv("OTP_STORE", "memory")
+
+
+class OTPStore(ABC):
+    """
+    Where issued OTPs live until they are used or expire. Implementations
+    shared between workers let a code issued by one process be verified by
+    another.
+    """
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float = OTP_TTL) -> None: ...
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def consume(self, key: str, value: str) -> bool:
+        """
+        Removes ``key`` if it holds ``value`` and reports whether it did, as
+        one step, so a code can only be used once however many requests
+        present it at the same time. A wrong value leaves the code in place.
+        """
+
+
+def _matches(expected: str, value: str) -> bool:
+    # compared as bytes: compare_digest rejects non-ASCII str
+    return hmac.compare_digest(expected.encode(), value.encode())
+
+
+class MemoryOTPStore(OTPStore):
+    """
+    A per-process store. Expiry times are kept in a min-heap so expired codes
+    are dropped in bulk from the front of the heap on every write, and the
+    soonest-to-expire codes are evicted first once ``maxsize`` is reached.
+    """
+
+    def __init__(self, maxsize: int = OTP_STORE_SIZE):
+        self.maxsize = maxsize
+        self._data: Dict[str, Tuple[float, str]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+
+    def _purge(self, now: float) -> None:
+        expiry, data = self._expiry, self._data
+        while expiry and expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(expiry)
+            # a key that was re-issued has a newer heap entry of its own
+            if key in data and data[key][0] == expires_at:
+                del data[key]
+
+        if len(expiry) > 2 * len(data) + 64:
+            self._expiry = [(entry[0], key) for key, entry in data.items()]
+            heapq.heapify(self._expiry)
+
+    async def set(self, key: str, value: str, ttl: float = OTP_TTL) -> None:
+        now = time.monotonic()
+        self._purge(now)
+
+        while key not in self._data and len(self._data) >= self.maxsize:
+            expires_at, oldest = heapq.heappop(self._expiry)
+            if oldest in self._data and self._data[oldest][0] == expires_at:
+                del self._data[oldest]
+
+        expires_at = now + ttl
+        self._data[key] = (expires_at, value)
+        heapq.heappush(self._expiry, (expires_at, key))
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def consume(self, key: str, value: str) -> bool:
+        # no await between the check and the removal
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic() or not _matches(entry[1], value):
+            return False
+        del self._data[key]
+        return True
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class FileOTPStore(OTPStore):
+    """
+    A JSON file guarded by ``flock``, shared by every worker on the host.
+    Mostly useful as a local stand-in for a networked backend.
+    """
+
+    def __init__(self, path: str, maxsize: int = OTP_STORE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+
+    def _update(self, mutate) -> Optional[str]:
+        import fcntl  # POSIX only
+
+        with open(self.path, "a+") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                raw = file.read()
+                data = json.loads(raw) if raw else {}
+
+                now = time.time()
+                data = {k: v for k, v in data.items() if v[0] > now}
+                result = mutate(data, now)
+                if len(data) > self.maxsize:
+                    for k, _ in sorted(data.items(), key=lambda item: item[1][0])[
+                        : len(data) - self.maxsize
+                    ]:
+                        del data[k]
+
+                file.seek(0)
+                file.truncate()
+                json.dump(data, file)
+                return result
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    async def set(self, key: str, value: str, ttl: float = OTP_TTL) -> None:
+        def mutate(data, now):
+            data[key] = [now + ttl, value]
+
+        await asyncio.to_thread(self._update, mutate)
+
+    async def get(self, key: str) -> Optional[str]:
+        def mutate(data, now):
+            entry = data.get(key)
+            return entry[1] if entry else None
+
+        return await asyncio.to_thread(self._update, mutate)
+
+    async def delete(self, key: str) -> None:
+        def mutate(data, now):
+            data.pop(key, None)
+
+        await asyncio.to_thread(self._update, mutate)
+
+    async def consume(self, key: str, value: str) -> bool:
+        def mutate(data, now):
+            entry = data.get(key)
+            if entry is None or not _matches(entry[1], value):
+                return False
+            del data[key]
+            return True
+
+        return await asyncio.to_thread(self._update, mutate)
+
+
+def get_otp_store(spec: str = OTP_STORE) -> OTPStore:
+    """
+    Builds the store named by ``OTP_STORE``: ``memory`` or ``file:<path>``.
+    """
+    if spec.startswith("file:"):
+        return FileOTPStore(spec[len("file:"):])
+    return MemoryOTPStore()
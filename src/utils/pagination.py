@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+from datetime import datetime
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+)
+from uuid import UUID
+
+from pydantic import BaseModel
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 20))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+
+T = TypeVar("T")
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(sort_key: Any, row_id: Any) -> str:
+    raw = json.dumps([str(sort_key), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str, parse_key: Callable[[str], Any] = datetime.fromisoformat
+) -> Tuple[Any, UUID]:
+    """
+    Returns the cursor's sort key, parsed by ``parse_key`` (an ISO timestamp
+    by default), and row id. Anything else is an ``InvalidCursorError``, so
+    cursor values never reach a query unchecked.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_key, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return parse_key(str(sort_key)), UUID(str(row_id))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def paginate(
+    query,
+    *,
+    cursor: Optional[str],
+    limit: int,
+    id_column: str = "id",
+    sort_column: str = "created_at",
+):
+    """
+    Applies keyset pagination over ``(sort_column, id_column)``, newest first.
+    One extra row is requested so ``build_page`` can tell if more remain.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        sort_key = created_at.isoformat()
+        query = query.or_(
+            f'{sort_column}.lt."{sort_key}",'
+            f'and({sort_column}.eq."{sort_key}",{id_column}.lt.{row_id})'
+        )
+    return (
+        query.order(sort_column, desc=True)
+        .order(id_column, desc=True)
+        .limit(limit + 1)
+    )
+
+
+def build_page(
+    rows: List[dict],
+    *,
+    limit: int,
+    parse: Callable[[dict], T],
+    id_column: str = "id",
+    sort_column: str = "created_at",
+) -> Page[T]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort_column], last[id_column])
+    return Page[Any](items=[parse(row) for row in rows], next_cursor=next_cursor)
+
+
+async def iterate_pages(
+    fetch: Callable[[Optional[str]], Awaitable[Page[T]]], first: Page[T]
+) -> AsyncIterator[List[T]]:
+    """
+    Yields the items of ``first`` and of every page after it. The next page
+    is fetched while the current one is being consumed, so at most two
+    pages are held in memory however long the result is.
+    """
+    page = first
+    while True:
+        pending = (
+            asyncio.ensure_future(fetch(page.next_cursor)) if page.next_cursor else None
+        )
+        try:
+            yield page.items
+        except BaseException:
+            if pending is not None:
+                pending.cancel()
+            raise
+        if pending is None:
+            return
+        page = await pending
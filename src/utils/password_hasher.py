@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    from argon2 import PasswordHasher as Argon2Hasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+
+except ImportError:
+    Argon2Hasher = None
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 256))
+
+SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_PREFIX = "$scrypt$"
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a dedicated thread pool so the memory
+    hard work never runs on the event loop. argon2id is used when
+    ``argon2-cffi`` is installed, otherwise scrypt from the standard library;
+    both release the GIL while hashing.
+
+    At most ``workers`` hashes run at once. Up to ``max_waiting`` more may
+    queue behind them, after which ``PasswordHasherBusy`` is raised instead
+    of letting logins pile up.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_waiting: int = PASSWORD_HASH_QUEUE_SIZE,
+    ):
+        self.workers = workers
+        self.max_waiting = max_waiting
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self._argon2 = Argon2Hasher() if Argon2Hasher is not None else None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self.waiting
+
+    async def _run(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Synchronous primitives, run on the pool
+    def hash_sync(self, password: str) -> str:
+        if self._argon2 is not None:
+            return self._argon2.hash(password)
+
+        salt = os.urandom(16)
+        digest = hashlib.scrypt(
+            password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P
+        )
+        return "%s%d$%d$%d$%s$%s" % (
+            SCRYPT_PREFIX,
+            SCRYPT_N,
+            SCRYPT_R,
+            SCRYPT_P,
+            base64.b64encode(salt).decode(),
+            base64.b64encode(digest).decode(),
+        )
+
+    def verify_sync(self, stored: str, password: str) -> bool:
+        if stored.startswith("$argon2"):
+            if self._argon2 is None:
+                return False
+            try:
+                return self._argon2.verify(stored, password)
+            except (VerificationError, InvalidHashError):
+                return False
+
+        if stored.startswith(SCRYPT_PREFIX):
+            try:
+                n, r, p, salt, digest = stored[len(SCRYPT_PREFIX):].split("$")
+                candidate = hashlib.scrypt(
+                    password.encode(),
+                    salt=base64.b64decode(salt),
+                    n=int(n),
+                    r=int(r),
+                    p=int(p),
+                )
+                return hmac.compare_digest(candidate, base64.b64decode(digest))
+            except (ValueError, OverflowError):
+                # a malformed hash never matches
+                return False
+
+        # rows written before passwords were hashed
+        return hmac.compare_digest(stored.encode(), password.encode())
+
+    @staticmethod
+    def is_hashed(value: str) -> bool:
+        return value.startswith(("$argon2", SCRYPT_PREFIX))
+
+    def needs_rehash(self, stored: str) -> bool:
+        if not self.is_hashed(stored):
+            return True
+        if self._argon2 is not None:
+            return not stored.startswith("$argon2") or self._argon2.check_needs_rehash(stored)
+        return False
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, stored: str, password: str) -> bool:
+        return await self._run(self.verify_sync, stored, password)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+from typing import Iterable, Optional, Type
+
+from pydantic import BaseModel, create_model
+
+from src.utils.cache import TTLCache
+
+# field sets come from clients, so only the most recently used models are kept
+PROJECTION_CACHE_SIZE = int(os.getenv("PROJECTION_CACHE_SIZE", 256))
+
+_models = TTLCache(maxsize=PROJECTION_CACHE_SIZE, ttl=None)
+
+
+class InvalidFieldsError(ValueError):
+    pass
+
+
+def projection(model: Type[BaseModel], fields: Optional[Iterable[str]] = None) -> Type[BaseModel]:
+    """
+    A model with only ``fields`` of ``model`` (plus ``id``), built once per
+    distinct set of fields whatever their order or repetition, and kept
+    while it is among the ``PROJECTION_CACHE_SIZE`` most recently used.
+    Without ``fields`` this is ``model`` itself.
+    Only fields ``model`` declares can be asked for, so a projection of a
+    public model can never expose a column it leaves out.
+    """
+    if not fields:
+        return model
+
+    wanted = set(fields)
+    unknown = wanted - model.model_fields.keys()
+    if unknown:
+        raise InvalidFieldsError("Unknown fields: " + ", ".join(sorted(unknown)))
+    if "id" in model.model_fields:
+        wanted.add("id")
+
+    key = (model, frozenset(wanted))
+    projected = _models.get(key)
+    if projected is None:
+        projected = create_model(
+            f"{model.__name__}Projection",
+            # keep the declaration order so responses look like the full model
+            **{
+                name: (info.annotation, info)
+                for name, info in model.model_fields.items()
+                if name in wanted
+            },
+        )
+        _models.set(key, projected)
+    return projected
+
+
+def columns(model: Type[BaseModel], *extra: str, table: Optional[Type[BaseModel]] = None) -> str:
+    """
+    The PostgREST ``select`` for ``model``'s fields and ``extra`` columns,
+    such as the keyset used to paginate. With ``table`` only fields stored
+    in it are selected, which leaves out computed ones.
+    """
+    names = [
+        name for name in model.model_fields
+        if table is None or name in table.model_fields
+    ]
+    return ",".join(dict.fromkeys([*names, *extra]))
+
+
+def project(item: BaseModel, model: Type[BaseModel], **values) -> BaseModel:
+    """
+    Copies the fields of ``model`` out of an already validated ``item``,
+    without validating them again.
+    """
+    if type(item) is model and not values:
+        return item
+    data = {
+        name: getattr(item, name)
+        for name in model.model_fields
+        if name not in values and hasattr(item, name)
+    }
+    data.update((name, value) for name, value in values.items() if name in model.model_fields)
+    return model.model_construct(**data)
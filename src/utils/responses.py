@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+from typing import Any, AsyncIterable, List
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+from src.utils.cache import TTLCache
+
+NDJSON = "application/x-ndjson"
+# projections make a model class per requested field set, see projection.py
+RESPONSE_ADAPTER_CACHE_SIZE = int(os.getenv("RESPONSE_ADAPTER_CACHE_SIZE", 256))
+
+_adapters = TTLCache(maxsize=RESPONSE_ADAPTER_CACHE_SIZE, ttl=None)
+
+
+def _list_adapter(model: type) -> TypeAdapter:
+    # compiled once per model class, then reused while recently used
+    adapter = _adapters.get(model)
+    if adapter is None:
+        adapter = TypeAdapter(List[model])
+        _adapters.set(model, adapter)
+    return adapter
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    Serializes ``content`` to JSON bytes with pydantic's compiled serializers.
+    Models are dumped as with ``model_dump_json``, lists of one model class
+    through a cached ``TypeAdapter``, and dicts are assembled from their
+    serialized values, so nothing passes through ``jsonable_encoder``.
+    """
+    if isinstance(content, dict):
+        return b"{%s}" % b",".join(
+            to_json(str(key)) + b":" + dump_json(value) for key, value in content.items()
+        )
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if isinstance(content, list) and content and isinstance(content[0], BaseModel):
+        model = type(content[0])
+        if all(type(item) is model for item in content):
+            return _list_adapter(model).dump_json(content)
+    return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    A ``JSONResponse`` that accepts pydantic models anywhere in its content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+class NDJSONResponse(StreamingResponse):
+    """
+    Streams newline-delimited JSON, one line per item, writing each page of
+    items as a single chunk as soon as it is available.
+    """
+
+    media_type = NDJSON
+
+    def __init__(self, pages: AsyncIterable[list], **kwargs):
+        super().__init__(self._render(pages), **kwargs)
+
+    @staticmethod
+    async def _render(pages: AsyncIterable[list]):
+        async for items in pages:
+            if items:
+                yield b"".join(dump_json(item) + b"\n" for item in items)
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
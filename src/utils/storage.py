@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, where a lock only holds within one process
+    fcntl = None
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local:uploads")
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "/media").rstrip("/")
+STORAGE_LOCK_POLL_INTERVAL = 0.05
+
+
+class StorageBackend(ABC):
+    """
+    Where uploaded media is staged while chunks arrive and published once
+    complete. Keys are relative, ``/`` separated paths.
+    """
+
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """
+        The number of bytes stored under ``key``, or None if it is missing.
+        """
+
+    @abstractmethod
+    async def append(self, key: str, offset: int, chunks: AsyncIterable[bytes]) -> int:
+        """
+        Writes ``chunks`` to ``key`` starting at ``offset`` as they arrive,
+        creating it if needed, and returns the number of bytes written. If
+        ``chunks`` raises, whatever was written so far is left in place.
+        """
+
+    @abstractmethod
+    async def truncate(self, key: str, size: int) -> None: ...
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes) -> None: ...
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def list(self, prefix: str) -> List[str]:
+        """
+        The keys stored directly under ``prefix``.
+        """
+
+    @abstractmethod
+    async def publish(self, key: str, name: str) -> str:
+        """
+        Moves ``key`` to its public location as ``name`` and returns its URL.
+        """
+
+    @abstractmethod
+    def lock(self, key: str) -> AsyncIterator[None]:
+        """
+        An async context manager holding an exclusive lock on ``key`` against
+        every process sharing this storage. A missing key is not locked.
+        """
+
+
+class LocalStorage(StorageBackend):
+    """
+    Files under ``root`` on the local disk, with published media in
+    ``root/media`` served by the app under ``base_url``. Blocking file calls
+    run in worker threads.
+    """
+
+    def __init__(self, root: str, base_url: str = MEDIA_BASE_URL):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url
+        self.media_dir = os.path.join(self.root, "media")
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key {key!r}")
+        return path
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return await asyncio.to_thread(os.path.getsize, self._path(key))
+        except FileNotFoundError:
+            return None
+
+    async def append(self, key: str, offset: int, chunks: AsyncIterable[bytes]) -> int:
+        path = self._path(key)
+
+        def open_at():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file = open(path, "r+b" if os.path.exists(path) else "w+b")
+            file.seek(offset)
+            return file
+
+        file = await asyncio.to_thread(open_at)
+        written = 0
+        try:
+            async for piece in chunks:
+                # one piece of the request body at a time, never the whole chunk
+                await asyncio.to_thread(file.write, piece)
+                written += len(piece)
+        finally:
+            await asyncio.to_thread(file.close)
+        return written
+
+    async def truncate(self, key: str, size: int) -> None:
+        path = self._path(key)
+
+        def truncate():
+            with open(path, "r+b") as file:
+                file.truncate(size)
+
+        await asyncio.to_thread(truncate)
+
+    async def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+
+        def write():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written aside and renamed so readers never see half a file
+            with open(path + ".tmp", "wb") as file:
+                file.write(data)
+            os.replace(path + ".tmp", path)
+
+        await asyncio.to_thread(write)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+
+        def read():
+            with open(path, "rb") as file:
+                return file.read()
+
+        try:
+            return await asyncio.to_thread(read)
+        except FileNotFoundError:
+            return None
+
+    async def delete(self, key: str) -> None:
+        try:
+            await asyncio.to_thread(os.remove, self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def list(self, prefix: str) -> List[str]:
+        path = self._path(prefix)
+
+        def names():
+            return [name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name))]
+
+        try:
+            return [f"{prefix}/{name}" for name in await asyncio.to_thread(names)]
+        except FileNotFoundError:
+            return []
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        try:
+            file = await asyncio.to_thread(open, self._path(key), "rb")
+        except FileNotFoundError:
+            yield
+            return
+        try:
+            # polled rather than blocking, which would hold a thread meanwhile
+            while fcntl is not None:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(STORAGE_LOCK_POLL_INTERVAL)
+            yield
+        finally:
+            # closing the file releases the lock
+            file.close()
+
+    async def publish(self, key: str, name: str) -> str:
+        source, target = self._path(key), self._path(f"media/{name}")
+
+        def move():
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+
+        await asyncio.to_thread(move)
+        return f"{self.base_url}/{name}"
+
+
+def get_storage(spec: str = STORAGE_BACKEND) -> StorageBackend:
+    """
+    Builds the backend named by ``STORAGE_BACKEND``: ``local:<directory>``.
+    """
+    kind, _, location = spec.partition(":")
+    if kind != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND {spec!r}")
+    return LocalStorage(location or "uploads")
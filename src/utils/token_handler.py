@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import os
+import time
 from datetime import datetime, timedelta
 from typing import TYPE_CHECKING, Optional
 from uuid import UUID
@@ -9,11 +11,14 @@ from pydantic import BaseModel, Field
 from pytz import timezone
 
 from src.models import UserModel
+from src.utils.cache import TTLCache
 from src.utils.log import log
 
 if TYPE_CHECKING:
     pass
 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
 
 class Token(BaseModel):
     sub: UUID
@@ -35,6 +40,9 @@ class TokenHandler:
         self.secret = secret
         self.algorithm = algorithm
 
+        # raw bearer string -> verified Token, each entry expiring with the token
+        self.verified = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=None)
+
     def create_access_token(self, user: UserModel, expire_in: int = 360) -> str:
         log.debug("Creating access token for user: %s", user.id)
         payload = Token(
@@ -67,11 +75,19 @@ class TokenHandler:
             return None
 
     def decode_token(self, token: str) -> Optional[Token]:
-        log.debug("Decoding token")
+        cached = self.verified.get(token)
+        if cached is not None:
+            return cached
+
         try:
             decoded = jwt.decode(token, self.secret, algorithms=[self.algorithm])
-            log.info("Token successfully decoded")
-            return Token(**decoded)
         except jwt.InvalidTokenError:
             log.error("Token decoding failed due to invalid token", exc_info=True)
             raise
+
+        parsed = Token(**decoded)
+        ttl = parsed.exp - time.time()
+        if ttl > 0:
+            self.verified.set(token, parsed, ttl=ttl)
+        log.debug("Token decoded for user: %s", parsed.sub)
+        return parsed
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import mimetypes
+import os
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple, Union
+from uuid import UUID
+
+from src.models import MediaType
+from src.models.upload import UploadCreate, UploadSession
+from src.utils.log import log
+from src.utils.storage import StorageBackend, get_storage
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", 1024 * 1024 * 1024))
+UPLOAD_TTL = float(os.getenv("UPLOAD_TTL", 24 * 3600))
+UPLOAD_SWEEP_INTERVAL = float(os.getenv("UPLOAD_SWEEP_INTERVAL", 3600))
+UPLOAD_MAX_SESSIONS = int(os.getenv("UPLOAD_MAX_SESSIONS", 10))
+UPLOAD_MAX_RESERVED = int(os.getenv("UPLOAD_MAX_RESERVED", 4 * 1024 * 1024 * 1024))
+
+# published media keeps one of these extensions, which decides the type it
+# is served with; markup such as .html or .svg would run in the API's origin
+MEDIA_EXTENSIONS = {
+    MediaType.IMAGE: (".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif"),
+    MediaType.VIDEO: (".mp4", ".mov", ".m4v", ".webm"),
+}
+
+
+class UploadError(Exception):
+    """
+    A request the upload can not accept. ``offset`` is where the client
+    should resume from, when that is what went wrong.
+    """
+
+    def __init__(self, message: str, status_code: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadManager:
+    """
+    Resumable uploads sent as a series of chunks. Each chunk names the offset
+    it starts at and carries its SHA-256, is streamed to storage as it
+    arrives, and is rolled back if the checksum does not match, so a client
+    can always resume from the stored size. Session metadata is kept next to
+    the data in storage, which lets any worker sharing it continue an upload;
+    writes to one upload are serialised by a lock taken in storage, so they
+    also exclude each other across workers. Sessions left unfinished are
+    removed by a periodic ``sweep`` once they expire.
+
+    Each owner may hold ``max_sessions`` open uploads reserving at most
+    ``max_reserved`` bytes between them. Both are checked when an upload is
+    created, so creates racing on different workers can briefly exceed them.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        *,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        max_size: int = UPLOAD_MAX_SIZE,
+        ttl: float = UPLOAD_TTL,
+        max_sessions: int = UPLOAD_MAX_SESSIONS,
+        max_reserved: int = UPLOAD_MAX_RESERVED,
+    ):
+        self.storage = storage
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_reserved = max_reserved
+        # waiters in this process queue here rather than polling the storage lock
+        self._locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self._task: Optional[asyncio.Task] = None
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    @asynccontextmanager
+    async def _locked(self, meta_key: str) -> AsyncIterator[None]:
+        # the session file is the lock, so one gone means the upload is too
+        async with self._lock(meta_key):
+            async with self.storage.lock(meta_key):
+                yield
+
+    @staticmethod
+    def _data_key(upload_id: Union[UUID, str]) -> str:
+        return f"uploads/{upload_id}.part"
+
+    @staticmethod
+    def _meta_key(upload_id: Union[UUID, str], owner_id: Union[UUID, str]) -> str:
+        # named after the owner too, so their sessions can be found by name
+        return f"uploads/{owner_id}.{upload_id}.json"
+
+    async def _sessions(self, owner_id: Union[UUID, str]) -> List[UploadSession]:
+        prefix = f"uploads/{owner_id}."
+        sessions = []
+        for key in await self.storage.list("uploads"):
+            if key.startswith(prefix) and key.endswith(".json"):
+                raw = await self.storage.get(key)
+                if raw is not None:
+                    sessions.append(UploadSession.model_validate_json(raw))
+        now = datetime.now(timezone.utc)
+        return [session for session in sessions if session.expires_at > now]
+
+    async def create(self, *, owner_id: Union[UUID, str], upload: UploadCreate) -> UploadSession:
+        if upload.size > self.max_size:
+            raise UploadError(f"Uploads are limited to {self.max_size} bytes", 413)
+
+        extension = os.path.splitext(upload.filename or "")[1].lower()
+        if not extension and upload.content_type:
+            extension = mimetypes.guess_extension(upload.content_type.split(";")[0].strip()) or ""
+        if extension not in MEDIA_EXTENSIONS[upload.media_type]:
+            allowed = ", ".join(MEDIA_EXTENSIONS[upload.media_type])
+            raise UploadError(f"Unsupported {upload.media_type.value} type, use one of {allowed}", 415)
+
+        sessions = await self._sessions(owner_id)
+        if len(sessions) >= self.max_sessions:
+            raise UploadError(f"At most {self.max_sessions} uploads can be open at once", 429)
+        if sum(session.size for session in sessions) + upload.size > self.max_reserved:
+            raise UploadError(f"Open uploads are limited to {self.max_reserved} bytes in total", 413)
+
+        session = UploadSession(
+            id=uuid.uuid4(),
+            owner_id=owner_id,
+            media_type=upload.media_type,
+            size=upload.size,
+            chunk_size=self.chunk_size,
+            content_type=upload.content_type,
+            extension=extension,
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl),
+        )
+        await self.storage.put(self._meta_key(session.id, owner_id), session.model_dump_json().encode())
+        return session
+
+    async def get(self, *, upload_id: Union[UUID, str], owner_id: Union[UUID, str]) -> UploadSession:
+        raw = await self.storage.get(self._meta_key(upload_id, owner_id))
+        session = UploadSession.model_validate_json(raw) if raw else None
+        if session is None or str(session.owner_id) != str(owner_id):
+            raise UploadError("Upload not found", 404)
+        if session.expires_at <= datetime.now(timezone.utc):
+            await self._discard(upload_id, owner_id)
+            raise UploadError("Upload expired", 404)
+        session.offset = await self.storage.size(self._data_key(upload_id)) or 0
+        return session
+
+    async def write_chunk(
+        self,
+        *,
+        upload_id: Union[UUID, str],
+        owner_id: Union[UUID, str],
+        offset: int,
+        checksum: str,
+        chunks: AsyncIterable[bytes],
+    ) -> UploadSession:
+        """
+        Appends one chunk at ``offset``, which must be the number of bytes
+        stored so far. ``checksum`` is the hex SHA-256 of the chunk.
+        """
+        async with self._locked(self._meta_key(upload_id, owner_id)):
+            session = await self.get(upload_id=upload_id, owner_id=owner_id)
+            if offset != session.offset:
+                raise UploadError("Offset does not match the bytes received", 409, session.offset)
+            if offset == session.size:
+                raise UploadError("Upload already received in full", 409, offset)
+
+            limit = min(self.chunk_size, session.size - offset)
+            digest = hashlib.sha256()
+
+            async def verified():
+                received = 0
+                async for piece in chunks:
+                    received += len(piece)
+                    if received > limit:
+                        raise UploadError(f"Chunk larger than {limit} bytes", 413, offset)
+                    digest.update(piece)
+                    yield piece
+
+            key = self._data_key(upload_id)
+            try:
+                written = await self.storage.append(key, offset, verified())
+                if not hmac.compare_digest(digest.hexdigest(), checksum.strip().lower()):
+                    raise UploadError("Checksum mismatch", 400, offset)
+            except BaseException:
+                # drop the partial chunk so the client can resend it whole
+                if await self.storage.size(key) is not None:
+                    await self.storage.truncate(key, offset)
+                raise
+
+            session.offset = offset + written
+            return session
+
+    async def complete(self, *, upload_id: Union[UUID, str], owner_id: Union[UUID, str]) -> Tuple[UploadSession, str]:
+        """
+        Publishes a fully received upload and returns its session and URL.
+        """
+        async with self._locked(self._meta_key(upload_id, owner_id)):
+            session = await self.get(upload_id=upload_id, owner_id=owner_id)
+            if session.offset != session.size:
+                raise UploadError("Upload is incomplete", 409, session.offset)
+            url = await self.storage.publish(
+                self._data_key(upload_id), f"{upload_id}{session.extension}"
+            )
+            await self.storage.delete(self._meta_key(upload_id, owner_id))
+            return session, url
+
+    async def abort(self, *, upload_id: Union[UUID, str], owner_id: Union[UUID, str]) -> None:
+        async with self._locked(self._meta_key(upload_id, owner_id)):
+            await self.get(upload_id=upload_id, owner_id=owner_id)
+            await self._discard(upload_id, owner_id)
+
+    async def _discard(self, upload_id: Union[UUID, str], owner_id: Union[UUID, str]) -> None:
+        await self.storage.delete(self._data_key(upload_id))
+        await self.storage.delete(self._meta_key(upload_id, owner_id))
+
+    async def sweep(self) -> int:
+        """
+        Removes expired sessions, and data whose session is gone, returning
+        the number of uploads removed.
+        """
+        keys = await self.storage.list("uploads")
+        # session files are named <owner id>.<upload id>.json
+        sessions = {
+            key[len("uploads/"):-len(".json")].rpartition(".")[2]: key
+            for key in keys if key.endswith(".json")
+        }
+        now = datetime.now(timezone.utc)
+        removed = 0
+        for upload_id, meta_key in sessions.items():
+            async with self._locked(meta_key):
+                raw = await self.storage.get(meta_key)
+                if raw is None:
+                    continue
+                try:
+                    expired = UploadSession.model_validate_json(raw).expires_at <= now
+                except ValueError:
+                    expired = True
+                if expired:
+                    await self.storage.delete(self._data_key(upload_id))
+                    await self.storage.delete(meta_key)
+                    removed += 1
+        for key in keys:
+            upload_id = key[len("uploads/"):-len(".part")]
+            if key.endswith(".part") and upload_id not in sessions:
+                # sessions are written before any data, so this one is gone
+                await self.storage.delete(key)
+                removed += 1
+        return removed
+
+    async def _run(self, interval: float):
+        while True:
+            try:
+                removed = await self.sweep()
+                if removed:
+                    log.info("Removed %d abandoned uploads", removed)
+            except Exception:
+                log.error("Upload sweep failed", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = UPLOAD_SWEEP_INTERVAL):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+uploads = UploadManager(get_storage())
@@ -1,27 +1,105 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Optional, Union, List
+from datetime import datetime, timezone
+from typing import Any, Optional, Sequence, Union, List
 from uuid import UUID
 
 from dotenv import load_dotenv
+from src.models import MediaType, PaymentMode, UserGenre, WorkMode
 from src.models.user import (
     UserModel, ShowcaseModel, CommentModel, VisionBoardModel,
     ShowCaseLikeModel, ShowCaseBookmarkModel, CommentUpvoteModel,
-    VisionBoardTaskModel, FollowerModel
+    VisionBoardTaskModel, FollowerModel, NearbyUserModel, ShowcaseDetailModel,
+    ConversationModel, PublicUserModel
 )
-from supabase import AsyncClient, create_async_client
+from src.utils.cache import TTLCache
+from src.utils.etag import ETagCache
+from src.utils.follow_graph import FollowGraph
+from src.utils.http_pool import PooledTransport, create_http_client, warm_pool
+from src.utils.geo_index import GeoEntry, GeoIndex
+from src.utils.leaderboard import Leaderboard
+from src.utils.message_hub import message_hub
+from src.utils.metrics import instrument
+from src.utils.password_hasher import PasswordHasher
+from src.utils.projection import columns, project, projection
+from src.utils.pagination import (
+    Page, build_page, clamp_limit, decode_cursor, encode_cursor, paginate
+)
+from src.utils.user_loader import UserLoader, request_loader
+from src.utils.write_buffer import INSERT, WriteBuffer
+from supabase import AsyncClient, AsyncClientOptions, create_async_client
 
 load_dotenv()
 
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 4096))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+MESSAGE_PREVIEW_LENGTH = int(os.getenv("MESSAGE_PREVIEW_LENGTH", 120))
+# below PostgREST's max-rows, which would otherwise cut off the extra row
+# paginate asks for
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", 500))
+
+# user columns clients can not write: rating is given by other users and
+# created_at by the database
+SERVER_MANAGED_USER_FIELDS = {"created_at", "rating"}
+
+# tables written through the write buffer and the columns identifying a row
+INTERACTION_KEYS = {
+    "ShowCaseLikeModel": ("user_id", "showcase_id"),
+    "ShowCaseBookmarkModel": ("user_id", "showcase_id"),
+    "CommentUpvoteModel": ("user_id", "comment_id"),
+}
+
 
+@instrument
 class UserHandler:
     supabase: AsyncClient
 
+    def __init__(self):
+        self.user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+        self.follow_graph = FollowGraph()
+        self.geo_index = GeoIndex()
+        self.leaderboard = Leaderboard()
+        self.write_buffer = WriteBuffer(INTERACTION_KEYS)
+        self.password_hasher = PasswordHasher()
+        self.http_pool: Optional[PooledTransport] = None
+        self.etags = ETagCache()
+
     async def init(self):
+        url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+        self.http_pool = PooledTransport()
+        http_client = create_http_client(self.http_pool)
         self.supabase = await create_async_client(
-            os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+            url, key, options=AsyncClientOptions(httpx_client=http_client)
+        )
+        await warm_pool(http_client, url, key, http2=self.http_pool.http2)
+        await asyncio.gather(
+            self.follow_graph.load(self.supabase),
+            self.geo_index.load(self.supabase),
+            self.leaderboard.refresh(self.supabase),
         )
+        self.follow_graph.start(self.supabase)
+        self.geo_index.start(self.supabase)
+        self.leaderboard.start(self.supabase)
+        self.write_buffer.start(self.supabase)
+
+    @property
+    def users(self) -> UserLoader:
+        """
+        The current request's user loader. Methods returning people resolve
+        them through it, so every profile a request needs is fetched in one
+        query.
+        """
+        return request_loader(self._fetch_users_by_ids)
+
+    async def close(self):
+        await self.follow_graph.stop()
+        await self.geo_index.stop()
+        await self.leaderboard.stop()
+        await self.write_buffer.close()
+        self.password_hasher.close()
+        await self.supabase.postgrest.aclose()
 
     # User Management Methods
     async def fetch_user(
@@ -35,42 +113,103 @@ class UserHandler:
             return await self._fetch_user_by_id(user_id)
 
         if email and password:
-            return await self._fetch_user_by_email(email, password)
+            return await self._authenticate(email, password)
+
+        if email:
+            return await self._fetch_user_by_email(email)
 
     async def create_user(self, *, user: UserModel):
-        payload = user.model_dump(mode="json")
+        payload = user.model_dump(mode="json", exclude=SERVER_MANAGED_USER_FIELDS)
+        payload["password"] = await self.password_hasher.hash(user.password)
         response = await self.supabase.table("users").insert(payload).execute()
-        return self._parse(response.data)
+        created = self._parse(response.data)
+        if created is not None:
+            # the users sharing this email are looked up again
+            self.user_cache.pop(("email", created.email))
+            self._cache_user(created)
+            self.geo_index.upsert(created.model_dump(mode="json"))
+            self.leaderboard.update(created)
+        return created
 
     async def update_user(
         self, *, user_id: Union[UUID, str], update_payload: UserModel
     ) -> Optional[UserModel]:
-        payload = update_payload.model_dump(mode="json")
-        _id = payload.pop("id", user_id)
-        assert _id == user_id
+        # only the fields the client sent, so leaving out e.g. the location
+        # keeps it rather than clearing it
+        payload = update_payload.model_dump(
+            mode="json", exclude=SERVER_MANAGED_USER_FIELDS, exclude_unset=True
+        )
+        _id = payload.pop("id", str(user_id))
+        assert _id == str(user_id)
+        # always hashed, a client sending a stored hash must not be able to
+        # set it as their password
+        payload["password"] = await self.password_hasher.hash(update_payload.password)
         response = await (
             self.supabase.table("users").update(payload).eq("id", _id).execute()
         )
-        return self._parse(response.data)
+        self._invalidate_user(user_id)
+        updated = self._parse(response.data)
+        if updated is not None:
+            self.user_cache.pop(("email", updated.email))
+            self._cache_user(updated)
+            self.geo_index.upsert(updated.model_dump(mode="json"))
+            self.leaderboard.update(updated)
+        return updated
 
     # Follower Management Methods
-    async def get_followers(self, *, user_id: Union[UUID, str]) -> List[UserModel]:
-        response = await (
+    async def get_followers(
+        self,
+        *,
+        user_id: Union[UUID, str],
+        cursor: Optional[str] = None,
+        limit: int = 0,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Page[PublicUserModel]:
+        limit = clamp_limit(limit)
+        query = (
             self.supabase.table("FollowerModel")
-            .select("user_id")
+            .select("user_id, created_at")
             .eq("following_id", str(user_id))
-            .execute()
         )
-        return [UserModel(**user) for user in response.data]
+        response = await paginate(
+            query, cursor=cursor, limit=limit, id_column="user_id"
+        ).execute()
+        page = build_page(
+            response.data,
+            limit=limit,
+            parse=lambda row: UUID(row["user_id"]),
+            id_column="user_id",
+        )
+        return Page[Any](
+            items=await self._load_users(page.items, fields), next_cursor=page.next_cursor
+        )
 
-    async def get_following(self, *, user_id: Union[UUID, str]) -> List[UserModel]:
-        response = await (
+    async def get_following(
+        self,
+        *,
+        user_id: Union[UUID, str],
+        cursor: Optional[str] = None,
+        limit: int = 0,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Page[PublicUserModel]:
+        limit = clamp_limit(limit)
+        query = (
             self.supabase.table("FollowerModel")
-            .select("following_id")
+            .select("following_id, created_at")
             .eq("user_id", str(user_id))
-            .execute()
         )
-        return [UserModel(**user) for user in response.data]
+        response = await paginate(
+            query, cursor=cursor, limit=limit, id_column="following_id"
+        ).execute()
+        page = build_page(
+            response.data,
+            limit=limit,
+            parse=lambda row: UUID(row["following_id"]),
+            id_column="following_id",
+        )
+        return Page[Any](
+            items=await self._load_users(page.items, fields), next_cursor=page.next_cursor
+        )
 
     async def follow(self, following_id: Union[UUID, str], *, user_id: Union[UUID, str]):
         if isinstance(user_id, str):
@@ -80,6 +219,7 @@ class UserHandler:
         data = FollowerModel(user_id=user_id, following_id=following_id)
         payload = data.model_dump(mode="json")
         await self.supabase.table("FollowerModel").insert(payload).execute()
+        self.follow_graph.add(user_id, following_id)
 
     async def unfollow(self, following_id: Union[UUID, str], *, user_id: Union[UUID, str]):
         if isinstance(user_id, str):
@@ -93,16 +233,53 @@ class UserHandler:
             .eq("following_id", str(following_id))
             .execute()
         )
+        self.follow_graph.remove(user_id, following_id)
+
+    def get_follow_stats(self, *, user_id: Union[UUID, str]) -> dict:
+        return {
+            "followers": self.follow_graph.follower_count(user_id),
+            "following": self.follow_graph.following_count(user_id),
+        }
+
+    def is_following(self, *, user_id: Union[UUID, str], following_id: Union[UUID, str]) -> bool:
+        return self.follow_graph.is_following(user_id, following_id)
+
+    async def get_mutuals(self, *, user_id: Union[UUID, str], limit: int = 0, fields: Optional[Sequence[str]] = None) -> List[PublicUserModel]:
+        return await self._load_users(self.follow_graph.mutuals(user_id, clamp_limit(limit)), fields)
+
+    async def get_followed_by_following(self, *, viewer_id: Union[UUID, str], user_id: Union[UUID, str], limit: int = 0, fields: Optional[Sequence[str]] = None) -> List[PublicUserModel]:
+        return await self._load_users(
+            self.follow_graph.followed_by_following(viewer_id, user_id, clamp_limit(limit)), fields
+        )
 
     # Message Methods
-    async def get_message_users(self, *, user_id: Union[UUID, str]) -> List[UserModel]:
-        response = await (
-            self.supabase.table("messages")
-            .select("DISTINCT sender_id, receiver_id")
-            .or_(f"sender_id.eq.{user_id},receiver_id.eq.{user_id}")
-            .execute()
+    async def get_message_users(self, *, user_id: Union[UUID, str], cursor: Optional[str] = None, limit: int = 0) -> Page[ConversationModel]:
+        """
+        The user's conversations, most recent first, read from the
+        ``conversations`` table that ``create_message`` keeps up to date.
+        """
+        limit = clamp_limit(limit)
+        query = (
+            self.supabase.table("conversations")
+            .select("*")
+            .eq("user_id", str(user_id))
         )
-        return [UserModel(**user) for user in response.data]
+        response = await paginate(
+            query, cursor=cursor, limit=limit,
+            id_column="counterpart_id", sort_column="last_message_at",
+        ).execute()
+        page = build_page(
+            response.data,
+            limit=limit,
+            parse=lambda row: ConversationModel(**row),
+            id_column="counterpart_id",
+            sort_column="last_message_at",
+        )
+        counterparts = await self.users.load_many(entry.counterpart_id for entry in page.items)
+        for entry, counterpart in zip(page.items, counterparts):
+            if counterpart is not None:
+                entry.counterpart = project(counterpart, PublicUserModel)
+        return page
 
     async def create_message(self, *, sender_id: Union[UUID, str], receiver_id: Union[UUID, str], message: str):
         payload = {
@@ -110,34 +287,110 @@ class UserHandler:
             "receiver_id": str(receiver_id),
             "message": message
         }
-        await self.supabase.table("messages").insert(payload).execute()
-
-    async def get_messages(self, *, user_id: Union[UUID, str], other_user_id: Union[UUID, str], limit: int) -> List[dict]:
-        response = await (
+        inserted = await self.supabase.table("messages").insert(payload).execute()
+        row = inserted.data[0] if inserted.data else payload
+        sent_at = row.get("created_at") or datetime.now(timezone.utc).isoformat()
+
+        # both conversation rows in one statement that increments the unread
+        # count in place and never moves the preview back to an older message,
+        # see migrations/record_message.sql
+        await self.supabase.rpc("record_message", {
+            "sender": str(sender_id),
+            "receiver": str(receiver_id),
+            "preview": message[:MESSAGE_PREVIEW_LENGTH],
+            "sent_at": sent_at,
+        }).execute()
+
+        # the sender's other devices get it too
+        event = {"type": "message", "message": {**row, "created_at": sent_at}}
+        await asyncio.gather(*(
+            message_hub.publish(user_id, event) for user_id in {str(sender_id), str(receiver_id)}
+        ))
+
+    async def get_messages(self, *, user_id: Union[UUID, str], other_user_id: Union[UUID, str], limit: int, cursor: Optional[str] = None) -> Page[dict]:
+        limit = clamp_limit(limit)
+        query = (
             self.supabase.table("messages")
             .select("*")
             .or_(f"sender_id.eq.{user_id},receiver_id.eq.{user_id}")
             .or_(f"sender_id.eq.{other_user_id},receiver_id.eq.{other_user_id}")
-            .order("created_at", desc=True)
-            .limit(limit)
-            .execute()
         )
-        return response.data
+        pending = [paginate(query, cursor=cursor, limit=limit).execute()]
+        if cursor is None:
+            # opening a conversation marks it read
+            pending.append(
+                self.supabase.table("conversations")
+                .update({"unread_count": 0})
+                .eq("user_id", str(user_id))
+                .eq("counterpart_id", str(other_user_id))
+                .gt("unread_count", 0)
+                .execute()
+            )
+        response, *_ = await asyncio.gather(*pending)
+        return build_page(response.data, limit=limit, parse=dict)
+
+    async def backfill_conversations(self, *, page_size: int = BACKFILL_PAGE_SIZE) -> int:
+        """
+        Builds ``conversations`` rows from the message history, for messages
+        sent before the table existed. Messages are read newest first a page
+        at a time, so the first one seen for a pair is its last message.
+        Rows that already exist are left alone, ``create_message`` keeps
+        those current. Returns the number of conversations found.
+        """
+        seen = set()
+        cursor = None
+        while True:
+            query = self.supabase.table("messages").select(
+                "id, sender_id, receiver_id, message, created_at"
+            )
+            response = await paginate(query, cursor=cursor, limit=page_size).execute()
+            page = build_page(response.data, limit=page_size, parse=dict)
+
+            rows = []
+            for row in page.items:
+                for user_id, counterpart_id in (
+                    (row["sender_id"], row["receiver_id"]),
+                    (row["receiver_id"], row["sender_id"]),
+                ):
+                    if (user_id, counterpart_id) in seen:
+                        continue
+                    seen.add((user_id, counterpart_id))
+                    rows.append({
+                        "user_id": user_id,
+                        "counterpart_id": counterpart_id,
+                        "last_message": row["message"][:MESSAGE_PREVIEW_LENGTH],
+                        "last_sender_id": row["sender_id"],
+                        "last_message_at": row["created_at"],
+                        "unread_count": 0,
+                    })
+            if rows:
+                await (
+                    self.supabase.table("conversations")
+                    .upsert(rows, on_conflict="user_id,counterpart_id", ignore_duplicates=True)
+                    .execute()
+                )
+
+            if page.next_cursor is None:
+                return len(seen)
+            cursor = page.next_cursor
 
     # Showcase Methods
-    async def get_showcases(self, *, user_id: Union[UUID, str]) -> List[ShowcaseModel]:
-        response = await (
+    async def get_showcases(self, *, user_id: Union[UUID, str], cursor: Optional[str] = None, limit: int = 0, fields: Optional[Sequence[str]] = None) -> Page[ShowcaseModel]:
+        limit = clamp_limit(limit)
+        model = projection(ShowcaseModel, fields)
+        query = (
             self.supabase.table("showcases")
-            .select("*")
+            .select(columns(model, "created_at"))
             .eq("owner_id", str(user_id))
-            .execute()
         )
-        return [ShowcaseModel(**showcase) for showcase in response.data]
+        response = await paginate(query, cursor=cursor, limit=limit).execute()
+        return build_page(response.data, limit=limit, parse=lambda row: model(**row))
 
     async def create_showcase(self, *, showcase: ShowcaseModel, user_id: Union[UUID, str]):
-        payload = showcase.model_dump(mode="json")
+        payload = showcase.model_dump(mode="json", exclude={"created_at"})
         payload["owner_id"] = str(user_id)
         await self.supabase.table("showcases").insert(payload).execute()
+        self.etags.invalidate(("artist-showcases", str(user_id)))
 
     async def get_showcase(self, *, showcase_id: Union[UUID, str]) -> Optional[ShowcaseModel]:
         response = await (
@@ -148,8 +401,59 @@ class UserHandler:
         )
         return self._parse(response.data, model=ShowcaseModel)
 
+    async def get_showcase_detail(self, *, showcase_id: Union[UUID, str], viewer_id: Union[UUID, str]) -> Optional[ShowcaseDetailModel]:
+        showcase_id, viewer_id = str(showcase_id), str(viewer_id)
+        # the totals are columns kept by triggers, see
+        # migrations/showcase_counters.sql, and the viewer's own like and
+        # bookmark are embedded, so this is a single request
+        response = await (
+            self.supabase.table("showcases")
+            .select("*, liked:ShowCaseLikeModel(user_id), bookmarked:ShowCaseBookmarkModel(user_id)")
+            .eq("id", showcase_id)
+            .eq("liked.user_id", viewer_id)
+            .eq("bookmarked.user_id", viewer_id)
+            .execute()
+        )
+        if not response.data:
+            return None
+        row = response.data[0]
+        liked, like_count = self._with_pending(
+            "ShowCaseLikeModel", showcase_id, viewer_id, bool(row.pop("liked")), row.pop("like_count", 0)
+        )
+        bookmarked, bookmark_count = self._with_pending(
+            "ShowCaseBookmarkModel", showcase_id, viewer_id, bool(row.pop("bookmarked")), row.pop("bookmark_count", 0)
+        )
+        return ShowcaseDetailModel(
+            **row,
+            like_count=like_count,
+            bookmark_count=bookmark_count,
+            liked=liked,
+            bookmarked=bookmarked,
+        )
+
+    def _with_pending(self, table: str, showcase_id: str, viewer_id: str, stored: bool, count: int):
+        # the viewer's own like or bookmark may still sit in the write
+        # buffer; everyone else's show up once it is flushed
+        entry = self.write_buffer.pending[table].get((viewer_id, showcase_id))
+        if entry is None:
+            return stored, count
+        wanted = entry[0] == INSERT
+        return wanted, count + wanted - stored
+
+    async def attach_showcase_media(self, *, showcase_id: Union[UUID, str], user_id: Union[UUID, str], media_link: str, media_type: MediaType) -> Optional[ShowcaseModel]:
+        response = await (
+            self.supabase.table("showcases")
+            .update({"media_link": media_link, "media_type": media_type.value})
+            .eq("id", str(showcase_id))
+            .eq("owner_id", str(user_id))
+            .execute()
+        )
+        self.etags.invalidate(("showcase", str(showcase_id)))
+        self.etags.invalidate(("artist-showcases", str(user_id)))
+        return self._parse(response.data, model=ShowcaseModel)
+
     async def update_showcase(self, *, showcase_id: Union[UUID, str], showcase: ShowcaseModel, user_id: Union[UUID, str]):
-        payload = showcase.model_dump(mode="json")
+        payload = showcase.model_dump(mode="json", exclude={"created_at"})
         await (
             self.supabase.table("showcases")
             .update(payload)
@@ -157,6 +461,8 @@ class UserHandler:
             .eq("owner_id", str(user_id))
             .execute()
         )
+        self.etags.invalidate(("showcase", str(showcase_id)))
+        self.etags.invalidate(("artist-showcases", str(user_id)))
 
     async def delete_showcase(self, *, showcase_id: Union[UUID, str], user_id: Union[UUID, str]):
         await (
@@ -166,21 +472,25 @@ class UserHandler:
             .eq("owner_id", str(user_id))
             .execute()
         )
+        self.etags.invalidate(("showcase", str(showcase_id)))
+        self.etags.invalidate(("artist-showcases", str(user_id)))
 
     # Showcase Interaction Methods
     async def like_showcase(self, *, showcase_id: Union[UUID, str], user_id: Union[UUID, str]):
         data = ShowCaseLikeModel(user_id=user_id, showcase_id=showcase_id)
-        payload = data.model_dump(mode="json")
-        await self.supabase.table("ShowCaseLikeModel").insert(payload).execute()
+        self.write_buffer.insert("ShowCaseLikeModel", data.model_dump(mode="json"))
 
     async def unlike_showcase(self, *, showcase_id: Union[UUID, str], user_id: Union[UUID, str]):
-        await (
-            self.supabase.table("ShowCaseLikeModel")
-            .delete()
-            .eq("user_id", str(user_id))
-            .eq("showcase_id", str(showcase_id))
-            .execute()
-        )
+        data = ShowCaseLikeModel(user_id=user_id, showcase_id=showcase_id)
+        self.write_buffer.delete("ShowCaseLikeModel", data.model_dump(mode="json"))
+
+    async def like_showcases(self, *, showcase_ids: List[Union[UUID, str]], user_id: Union[UUID, str]):
+        for showcase_id in showcase_ids:
+            await self.like_showcase(showcase_id=showcase_id, user_id=user_id)
+
+    async def unlike_showcases(self, *, showcase_ids: List[Union[UUID, str]], user_id: Union[UUID, str]):
+        for showcase_id in showcase_ids:
+            await self.unlike_showcase(showcase_id=showcase_id, user_id=user_id)
 
     async def create_comment(self, *, showcase_id: Union[UUID, str], comment: CommentModel, user_id: Union[UUID, str]):
         payload = comment.model_dump(mode="json")
@@ -190,49 +500,47 @@ class UserHandler:
 
     async def upvote_comment(self, *, comment_id: Union[UUID, str], user_id: Union[UUID, str]):
         data = CommentUpvoteModel(user_id=user_id, comment_id=comment_id)
-        payload = data.model_dump(mode="json")
-        await self.supabase.table("CommentUpvoteModel").insert(payload).execute()
+        self.write_buffer.insert("CommentUpvoteModel", data.model_dump(mode="json"))
 
     async def remove_comment_upvote(self, *, comment_id: Union[UUID, str], user_id: Union[UUID, str]):
-        await (
-            self.supabase.table("CommentUpvoteModel")
-            .delete()
-            .eq("user_id", str(user_id))
-            .eq("comment_id", str(comment_id))
-            .execute()
-        )
+        data = CommentUpvoteModel(user_id=user_id, comment_id=comment_id)
+        self.write_buffer.delete("CommentUpvoteModel", data.model_dump(mode="json"))
 
     async def bookmark_showcase(self, *, showcase_id: Union[UUID, str], user_id: Union[UUID, str]):
         data = ShowCaseBookmarkModel(user_id=user_id, showcase_id=showcase_id)
-        payload = data.model_dump(mode="json")
-        await self.supabase.table("ShowCaseBookmarkModel").insert(payload).execute()
+        self.write_buffer.insert("ShowCaseBookmarkModel", data.model_dump(mode="json"))
 
     async def unbookmark_showcase(self, *, showcase_id: Union[UUID, str], user_id: Union[UUID, str]):
-        await (
-            self.supabase.table("ShowCaseBookmarkModel")
-            .delete()
-            .eq("user_id", str(user_id))
-            .eq("showcase_id", str(showcase_id))
-            .execute()
-        )
+        data = ShowCaseBookmarkModel(user_id=user_id, showcase_id=showcase_id)
+        self.write_buffer.delete("ShowCaseBookmarkModel", data.model_dump(mode="json"))
+
+    async def bookmark_showcases(self, *, showcase_ids: List[Union[UUID, str]], user_id: Union[UUID, str]):
+        for showcase_id in showcase_ids:
+            await self.bookmark_showcase(showcase_id=showcase_id, user_id=user_id)
+
+    async def unbookmark_showcases(self, *, showcase_ids: List[Union[UUID, str]], user_id: Union[UUID, str]):
+        for showcase_id in showcase_ids:
+            await self.unbookmark_showcase(showcase_id=showcase_id, user_id=user_id)
 
     # Vision Board Methods
-    async def get_visionboards(self, *, user_id: Union[UUID, str]) -> List[VisionBoardModel]:
-        response = await (
+    async def get_visionboards(self, *, user_id: Union[UUID, str], cursor: Optional[str] = None, limit: int = 0, fields: Optional[Sequence[str]] = None) -> Page[VisionBoardModel]:
+        limit = clamp_limit(limit)
+        model = projection(VisionBoardModel, fields)
+        query = (
             self.supabase.table("visionboards")
-            .select("*")
+            .select(columns(model, "created_at"))
             .eq("owner_id", str(user_id))
-            .execute()
         )
-        return [VisionBoardModel(**visionboard) for visionboard in response.data]
+        response = await paginate(query, cursor=cursor, limit=limit).execute()
+        return build_page(response.data, limit=limit, parse=lambda row: model(**row))
 
     async def create_visionboard(self, *, visionboard: VisionBoardModel, user_id: Union[UUID, str]):
-        payload = visionboard.model_dump(mode="json")
+        payload = visionboard.model_dump(mode="json", exclude={"created_at"})
         payload["owner_id"] = str(user_id)
         await self.supabase.table("visionboards").insert(payload).execute()
 
     async def update_visionboard(self, *, visionboard_id: Union[UUID, str], visionboard: VisionBoardModel, user_id: Union[UUID, str]):
-        payload = visionboard.model_dump(mode="json")
+        payload = visionboard.model_dump(mode="json", exclude={"created_at"})
         await (
             self.supabase.table("visionboards")
             .update(payload)
@@ -267,56 +575,183 @@ class UserHandler:
         )
 
     # Browse Methods
-    async def get_nearby_artists(self, *, user_id: Union[UUID, str]) -> List[UserModel]:
-        # TODO: Implement location-based search
-        response = await (
-            self.supabase.table("users")
-            .select("*")
-            .neq("id", str(user_id))
-            .execute()
-        )
-        return [UserModel(**user) for user in response.data]
-
-    async def get_top_rated_artists(self) -> List[UserModel]:
-        response = await (
-            self.supabase.table("users")
-            .select("*")
-            .order("rating", desc=True)
-            .limit(10)
-            .execute()
+    async def get_nearby_artists(
+        self,
+        *,
+        user_id: Union[UUID, str],
+        cursor: Optional[str] = None,
+        limit: int = 0,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        genre: Optional[UserGenre] = None,
+        work_mode: Optional[WorkMode] = None,
+        payment_mode: Optional[PaymentMode] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Page[NearbyUserModel]:
+        limit = clamp_limit(limit)
+        model = projection(NearbyUserModel, fields)
+        if latitude is None or longitude is None:
+            me = await self._fetch_user_by_id(user_id)
+            if me is not None:
+                latitude, longitude = me.latitude, me.longitude
+
+        if latitude is None or longitude is None:
+            # nowhere to search around, fall back to the newest artists
+            query = (
+                self.supabase.table("users")
+                .select(columns(model, "created_at", table=UserModel))
+                .neq("id", str(user_id))
+            )
+            if genre is not None:
+                query = query.eq("genres", genre.value)
+            if work_mode is not None:
+                query = query.eq("work_mode", work_mode.value)
+            if payment_mode is not None:
+                query = query.eq("payment_mode", payment_mode.value)
+            response = await paginate(query, cursor=cursor, limit=limit).execute()
+            return build_page(response.data, limit=limit, parse=lambda row: model(**row))
+
+        after = None
+        if cursor:
+            distance, row_id = decode_cursor(cursor, float)
+            after = (distance, row_id.int)
+
+        exclude = UUID(str(user_id)).int
+
+        def predicate(entry: GeoEntry) -> bool:
+            return (
+                entry.key != exclude
+                and (genre is None or entry.genres == genre.value)
+                and (work_mode is None or entry.work_mode == work_mode.value)
+                and (payment_mode is None or entry.payment_mode == payment_mode.value)
+            )
+
+        matches = self.geo_index.nearest(
+            latitude, longitude, limit + 1,
+            radius_km=radius_km, after=after, predicate=predicate,
         )
-        return [UserModel(**user) for user in response.data]
-
-    async def get_artist_showcases(self, *, artist_id: Union[UUID, str]) -> List[ShowcaseModel]:
-        response = await (
+        next_cursor = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            next_cursor = encode_cursor(*matches[-1])
+
+        users = await self.users.load_many(_id for _, _id in matches)
+        items = [
+            project(user, model, distance_km=round(distance, 3))
+            for (distance, _), user in zip(matches, users)
+            if user is not None
+        ]
+        return Page[Any](items=items, next_cursor=next_cursor)
+
+    async def get_top_rated_artists(self, *, genre: Optional[UserGenre] = None, fields: Optional[Sequence[str]] = None) -> List[PublicUserModel]:
+        model = projection(PublicUserModel, fields)
+        return [project(user, model) for user in await self.leaderboard.top(self.supabase, genre)]
+
+    async def get_artist_showcases(self, *, artist_id: Union[UUID, str], cursor: Optional[str] = None, limit: int = 0, fields: Optional[Sequence[str]] = None) -> Page[ShowcaseModel]:
+        limit = clamp_limit(limit)
+        model = projection(ShowcaseModel, fields)
+        query = (
             self.supabase.table("showcases")
-            .select("*")
+            .select(columns(model, "created_at"))
             .eq("owner_id", str(artist_id))
-            .execute()
         )
-        return [ShowcaseModel(**showcase) for showcase in response.data]
+        response = await paginate(query, cursor=cursor, limit=limit).execute()
+        return build_page(response.data, limit=limit, parse=lambda row: model(**row))
 
     # Helper Methods
-    async def _fetch_user_by_email(
-        self, email: str, password: str
-    ) -> Optional[UserModel]:
+    async def _authenticate(self, email: str, password: str) -> Optional[UserModel]:
+        # accounts created before emails were unique may share one, the
+        # password decides which of them is signing in; read from the
+        # database, since a password changed through another worker is not
+        # in this worker's cache
+        for user in await self._fetch_users_by_email(email, fresh=True):
+            if await self.password_hasher.verify(user.password, password):
+                break
+        else:
+            return None
+
+        if self.password_hasher.needs_rehash(user.password):
+            # upgrade plaintext or outdated hashes on the next good login
+            hashed = await self.password_hasher.hash(password)
+            await (
+                self.supabase.table("users")
+                .update({"password": hashed})
+                .eq("id", str(user.id))
+                .execute()
+            )
+            user = user.model_copy(update={"password": hashed})
+            self._cache_user(user)
+        return user
+
+    async def _fetch_user_by_email(self, email: str) -> Optional[UserModel]:
+        users = await self._fetch_users_by_email(email)
+        return users[0] if users else None
+
+    async def _fetch_users_by_email(self, email: str, *, fresh: bool = False) -> List[UserModel]:
+        """
+        Every user with ``email``, oldest first. ``fresh`` skips the cache.
+        """
+        cached_ids = None if fresh else self.user_cache.get(("email", email))
+        if cached_ids is not None:
+            cached = [self.user_cache.get(("id", _id)) for _id in cached_ids]
+            if all(user is not None and user.email == email for user in cached):
+                return cached
+
         response = await (
             self.supabase.table("users")
             .select("*")
             .eq("email", email)
-            .eq("password", password)
+            .order("created_at")
+            .order("id")
             .execute()
         )
-        print(response)
-        return self._parse(response.data)
+        users = [UserModel(**row) for row in response.data]
+        for user in users:
+            self._cache_user(user)
+        self.user_cache.set(("email", email), tuple(str(user.id) for user in users))
+        return users
 
     async def _fetch_user_by_id(self, user_id):
-        if isinstance(user_id, str):
-            user_id = UUID(user_id)
-        response = await (
-            self.supabase.table("users").select("*").eq("id", user_id).execute()
-        )
-        return self._parse(response.data)
+        return await self.users.load(user_id)
+
+    async def _load_users(self, user_ids: List[UUID], fields: Optional[Sequence[str]] = None) -> List[PublicUserModel]:
+        model = projection(PublicUserModel, fields)
+        # users deleted since they were referenced are left out
+        return [
+            project(user, model)
+            for user in await self.users.load_many(user_ids)
+            if user is not None
+        ]
+
+    async def _fetch_users_by_ids(self, user_ids: List[UUID]) -> dict:
+        users = {}
+        missing = []
+        for _id in user_ids:
+            cached = self.user_cache.get(("id", str(_id)))
+            if cached is not None:
+                users[_id] = cached
+            else:
+                missing.append(str(_id))
+
+        if missing:
+            response = await (
+                self.supabase.table("users").select("*").in_("id", missing).execute()
+            )
+            for row in response.data:
+                user = UserModel(**row)
+                self._cache_user(user)
+                users[user.id] = user
+        return users
+
+    def _cache_user(self, user: UserModel):
+        self.user_cache.set(("id", str(user.id)), user)
+
+    def _invalidate_user(self, user_id: Union[UUID, str]):
+        self.users.clear(user_id)
+        cached = self.user_cache.pop(("id", str(user_id)))
+        if cached is not None:
+            self.user_cache.pop(("email", cached.email))
 
     def _parse(self, response: list, count: int = 1, model: type = UserModel):
         if len(response) == 0:
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Union
+from uuid import UUID
+
+from src.models.user import UserModel
+
+BatchFunction = Callable[[List[UUID]], Awaitable[Dict[UUID, UserModel]]]
+
+# loaders of the request being handled, keyed by their batch function
+_loaders: ContextVar[Optional[Dict[BatchFunction, "UserLoader"]]] = ContextVar(
+    "user_loaders", default=None
+)
+
+
+class UserLoader:
+    """
+    Batches user lookups. Ids asked for during the same event-loop tick are
+    collected, de-duplicated and resolved by a single call to ``batch``.
+    Results are handed to the callers waiting on them and then forgotten, so
+    a long stream of pages holds no more than the page being built; a user
+    asked for again is served by the user cache behind ``batch``.
+    """
+
+    def __init__(self, batch: BatchFunction):
+        self.batch = batch
+        self.batches = 0
+
+        self._futures: Dict[UUID, asyncio.Future] = {}
+        self._queue: List[UUID] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, user_id: Union[UUID, str]) -> Optional[UserModel]:
+        key = user_id if isinstance(user_id, UUID) else UUID(str(user_id))
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            if not self._queue:
+                loop.call_soon(self._dispatch)
+            self._queue.append(key)
+        # other callers may be waiting on the same future
+        return await asyncio.shield(future)
+
+    async def load_many(self, user_ids: Iterable[Union[UUID, str]]) -> List[Optional[UserModel]]:
+        return list(await asyncio.gather(*(self.load(user_id) for user_id in user_ids)))
+
+    def clear(self, user_id: Union[UUID, str]) -> None:
+        self._futures.pop(UUID(str(user_id)), None)
+
+    def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        task = asyncio.ensure_future(self._resolve(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, keys: List[UUID]) -> None:
+        self.batches += 1
+        try:
+            users = await self.batch(keys)
+        except Exception as exc:
+            for key in keys:
+                # forget failures so the next load tries again
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(exc)
+            return
+
+        for key in keys:
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(users.get(key))
+
+
+def request_loader(batch: BatchFunction) -> UserLoader:
+    """
+    The loader for ``batch`` shared by everything handling the current
+    request. Outside a request every call gets a fresh loader.
+    """
+    loaders = _loaders.get()
+    if loaders is None:
+        return UserLoader(batch)
+    loader = loaders.get(batch)
+    if loader is None:
+        loader = loaders[batch] = UserLoader(batch)
+    return loader
+
+
+class UserLoaderMiddleware:
+    """
+    Scopes ``request_loader`` to a single HTTP request, so lookups from
+    concurrent handlers of one request are batched together and never leak
+    into another request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        token = _loaders.set({})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _loaders.reset(token)
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+from supabase import AsyncClient
+
+from src.utils.log import log
+
+WRITE_BUFFER_SIZE = int(os.getenv("WRITE_BUFFER_SIZE", 500))
+WRITE_BUFFER_INTERVAL = float(os.getenv("WRITE_BUFFER_INTERVAL", 1.0))
+WRITE_BUFFER_MAX_ATTEMPTS = 3
+DELETE_CHUNK_SIZE = 100
+
+INSERT = "insert"
+DELETE = "delete"
+
+
+def _rejected(error: APIError) -> bool:
+    # data exceptions and integrity violations, which fail the same way on
+    # every attempt, unlike timeouts or an unreachable database
+    return str(error.code or "")[:2] in ("22", "23")
+
+
+class WriteBuffer:
+    """
+    A write-behind buffer for idempotent interaction rows such as likes,
+    bookmarks and comment upvotes.
+
+    Each row is identified by its table's key columns and holds at most one
+    pending operation. Both operations are idempotent, so a later one for
+    the same row replaces the earlier: a like then an unlike within one
+    window still deletes a like that was already stored. Pending rows are
+    flushed as one bulk upsert and a few bulk deletes per table once
+    ``max_size`` rows are queued or every ``interval`` seconds, whichever
+    comes first.
+
+    The upsert resolves conflicts on the key columns, so each table needs a
+    unique constraint on them, e.g. ``unique (user_id, showcase_id)``. A
+    batch the database rejects is split until only the offending rows fail,
+    so one bad row never costs the rest of the batch.
+    """
+
+    def __init__(
+        self,
+        keys: Dict[str, Tuple[str, ...]],
+        max_size: int = WRITE_BUFFER_SIZE,
+        interval: float = WRITE_BUFFER_INTERVAL,
+    ):
+        self.keys = keys
+        self.max_size = max_size
+        self.interval = interval
+
+        # table -> row key -> (operation, payload, attempts)
+        self.pending: Dict[str, Dict[tuple, Tuple[str, dict, int]]] = {
+            table: {} for table in keys
+        }
+        self.size = 0
+        # bumped whenever rows leave ``pending`` and once they are written
+        self.generation = 0
+
+        self.flushed = 0
+        self.superseded = 0
+        self.failed = 0
+
+        self.supabase: Optional[AsyncClient] = None
+        self._lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def start(self, supabase: AsyncClient):
+        self.supabase = supabase
+        self._stopping.clear()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        # the loop is asked to stop rather than cancelled, so a flush it is
+        # running finishes writing the rows it took
+        self._stopping.set()
+        for task in (self._task, self._flush_task):
+            if task is not None:
+                await task
+        self._task = self._flush_task = None
+        await self.flush()
+
+    @property
+    def flushing(self) -> bool:
+        return self._lock.locked()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                log.error("Write buffer flush failed", exc_info=True)
+
+    def insert(self, table: str, payload: dict):
+        self._add(table, INSERT, payload)
+
+    def delete(self, table: str, payload: dict):
+        self._add(table, DELETE, payload)
+
+    def _add(self, table: str, operation: str, payload: dict, attempts: int = 0):
+        rows = self.pending[table]
+        key = self._key(table, payload)
+
+        existing = rows.get(key)
+        if existing is None:
+            self.size += 1
+        elif existing[0] != operation:
+            self.superseded += 1
+        rows[key] = (operation, payload, attempts)
+
+        if self.size >= self.max_size and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        if self.supabase is None:
+            return
+
+        async with self._lock:
+            batches, self.pending = self.pending, {table: {} for table in self.keys}
+            self.size = 0
+            self.generation += 1
+
+            try:
+                for table, rows in batches.items():
+                    if not rows:
+                        continue
+                    inserts = [entry for entry in rows.values() if entry[0] == INSERT]
+                    deletes = [entry for entry in rows.values() if entry[0] == DELETE]
+
+                    if inserts:
+                        await self._apply(table, rows, inserts, self._insert)
+                    for start in range(0, len(deletes), DELETE_CHUNK_SIZE):
+                        await self._apply(
+                            table, rows, deletes[start : start + DELETE_CHUNK_SIZE], self._delete
+                        )
+            except BaseException:
+                # interrupted, e.g. cancelled at shutdown: rows not yet
+                # written go back to the buffer rather than being lost
+                for table, rows in batches.items():
+                    for key, (operation, payload, attempts) in rows.items():
+                        if key not in self.pending[table]:
+                            self._add(table, operation, payload, attempts)
+                raise
+            finally:
+                self.generation += 1
+
+    async def _apply(
+        self,
+        table: str,
+        rows: Dict[tuple, Tuple[str, dict, int]],
+        entries: List[Tuple[str, dict, int]],
+        write,
+    ):
+        """
+        Writes ``entries`` and removes them from ``rows``, the batch being
+        flushed, once they are written or queued again.
+        """
+        try:
+            await write(table, [payload for _, payload, _ in entries])
+            self.flushed += len(entries)
+        except APIError as e:
+            if not _rejected(e):
+                log.error("Buffered %s on %s failed", entries[0][0], table, exc_info=True)
+                self._retry(table, entries)
+            elif len(entries) > 1:
+                # some row broke a constraint, e.g. a like on a deleted
+                # showcase: halve the batch until only bad rows fail
+                middle = len(entries) // 2
+                await self._apply(table, rows, entries[:middle], write)
+                await self._apply(table, rows, entries[middle:], write)
+                return
+            else:
+                # retrying a rejected row can not help
+                self.failed += 1
+                log.error(
+                    "Dropped buffered %s on %s rejected by the database: %s (%s)",
+                    entries[0][0], table, entries[0][1], e.message,
+                )
+        except Exception:
+            log.error("Buffered %s on %s failed", entries[0][0], table, exc_info=True)
+            self._retry(table, entries)
+        for _, payload, _ in entries:
+            rows.pop(self._key(table, payload), None)
+
+    def _key(self, table: str, payload: dict) -> tuple:
+        return tuple(payload[column] for column in self.keys[table])
+
+    def _retry(self, table: str, entries: List[Tuple[str, dict, int]]):
+        for operation, payload, attempts in entries:
+            # a newer operation for the same row supersedes the failed one
+            if self._key(table, payload) in self.pending[table]:
+                continue
+            if attempts + 1 >= WRITE_BUFFER_MAX_ATTEMPTS:
+                self.failed += 1
+                log.error(
+                    "Dropped buffered %s on %s after %d attempts: %s",
+                    operation, table, attempts + 1, payload,
+                )
+                continue
+            self._add(table, operation, payload, attempts + 1)
+
+    async def _insert(self, table: str, payloads: List[dict]):
+        await (
+            self.supabase.table(table)
+            .upsert(
+                payloads,
+                on_conflict=",".join(self.keys[table]),
+                ignore_duplicates=True,
+            )
+            .execute()
+        )
+
+    async def _delete(self, table: str, payloads: List[dict]):
+        columns = self.keys[table]
+        matches = ",".join(
+            "and(%s)" % ",".join(f"{column}.eq.{payload[column]}" for column in columns)
+            for payload in payloads
+        )
+        await self.supabase.table(table).delete().or_(matches).execute()